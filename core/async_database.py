@@ -0,0 +1,210 @@
+import asyncio
+import weakref
+
+import asyncpg
+
+from core.config import settings
+from core.notify import CHANNEL_WEB_CRAWLED
+
+
+# -------------------------
+# Async pool (asyncpg)
+# -------------------------
+# Contraparte async de core.database para workers asyncio (crawl_worker):
+# las llamadas a Postgres no bloquean el event loop.
+def _connect_kwargs():
+    return dict(
+        host=settings.SUPABASE_HOST,
+        database=settings.SUPABASE_DB,
+        user=settings.SUPABASE_USER,
+        password=settings.SUPABASE_PASSWORD,
+        port=int(settings.SUPABASE_PORT or 5432),
+        ssl="require",
+    )
+
+
+_async_pool = None
+_async_pool_loop = None
+# asyncio.Lock queda atado a un event loop: un lock por loop
+_async_pool_locks = weakref.WeakKeyDictionary()
+
+
+async def get_async_pool():
+    """
+    Devuelve el pool asyncpg del event loop actual (creación perezosa).
+    Tamaño según DB_POOL_MIN / DB_POOL_MAX, igual que el pool síncrono.
+    """
+    global _async_pool, _async_pool_loop
+
+    loop = asyncio.get_running_loop()
+    if _async_pool is not None and _async_pool_loop is loop:
+        return _async_pool
+
+    lock = _async_pool_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        if _async_pool is None or _async_pool_loop is not loop:
+            _async_pool = await asyncpg.create_pool(
+                **_connect_kwargs(),
+                min_size=settings.DB_POOL_MIN,
+                max_size=settings.DB_POOL_MAX,
+                # el pooler de Supabase (modo transaction) no soporta prepared statements cacheados
+                statement_cache_size=0,
+            )
+            _async_pool_loop = loop
+    return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool, _async_pool_loop
+
+    if _async_pool is not None:
+        await _async_pool.close()
+    _async_pool = None
+    _async_pool_loop = None
+
+
+# -------------------------
+# Claim pending documents (crawl)
+# -------------------------
+async def fetch_pending_web_documents_async(limit=10, lease_s=None):
+    """
+    Versión async de core.database.fetch_pending_web_documents
+    (FOR UPDATE SKIP LOCKED + crawl_lease_until, respetando backoff y dead-letter).
+    """
+    lease_s = settings.CRAWL_LEASE_S if lease_s is None else lease_s
+
+    pool = await get_async_pool()
+    rows = await pool.fetch(
+        """
+        WITH claimed AS (
+            SELECT id
+            FROM documents
+            WHERE source_type = 'serpapi'
+              AND raw_text IS NULL
+              AND crawl_dead_at IS NULL
+              AND (crawl_next_attempt_at IS NULL OR crawl_next_attempt_at <= NOW())
+              AND (crawl_lease_until IS NULL OR crawl_lease_until < NOW())
+            ORDER BY created_at DESC
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE documents d
+        SET crawl_lease_until = NOW() + make_interval(secs => $2)
+        FROM claimed
+        WHERE d.id = claimed.id
+        RETURNING d.id, d.canonical_identifier
+        """,
+        limit,
+        float(lease_s),
+    )
+
+    return [{"id": r["id"], "url": r["canonical_identifier"]} for r in rows]
+
+
+# -------------------------
+# Update raw_text
+# -------------------------
+async def update_raw_text_many_async(items):
+    """
+    Versión async de core.database.update_raw_text_many.
+    items: iterable de (doc_id, raw_text). executemany va en un solo round trip.
+    """
+    items = list(items)
+    if not items:
+        return 0
+
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.executemany(
+                """
+                UPDATE documents
+                SET raw_text = $1,
+                    crawl_lease_until = NULL
+                WHERE id = $2
+                """,
+                [(raw_text, doc_id) for doc_id, raw_text in items],
+            )
+            await conn.execute("SELECT pg_notify($1, $2)", CHANNEL_WEB_CRAWLED, str(len(items)))
+
+    return len(items)
+
+
+# -------------------------
+# Crawl failures (backoff + dead-letter)
+# -------------------------
+async def mark_crawl_failed_many_async(items):
+    """
+    Versión async de core.database.mark_crawl_failed_many.
+    items: iterable de (doc_id, error).
+    """
+    items = list(items)
+    if not items:
+        return 0
+
+    pool = await get_async_pool()
+    await pool.executemany(
+        """
+        UPDATE documents
+        SET crawl_attempts = crawl_attempts + 1,
+            crawl_last_error = $1,
+            crawl_lease_until = NULL,
+            crawl_next_attempt_at = NOW()
+                + make_interval(secs => LEAST($2 * power(2, crawl_attempts), $3)),
+            crawl_dead_at = CASE WHEN crawl_attempts + 1 >= $4 THEN NOW() END
+        WHERE id = $5
+        """,
+        [
+            (
+                str(error)[:1000],
+                float(settings.QUEUE_BACKOFF_BASE_S),
+                float(settings.QUEUE_BACKOFF_MAX_S),
+                settings.QUEUE_MAX_ATTEMPTS,
+                doc_id,
+            )
+            for doc_id, error in items
+        ],
+    )
+
+    return len(items)
+
+
+# -------------------------
+# LISTEN (async)
+# -------------------------
+class AsyncListener:
+    """
+    Versión asyncio de core.notify.Listener, con una conexión asyncpg dedicada:
+
+        async with AsyncListener(CHANNEL_WEB_DISCOVERED) as listener:
+            await listener.wait(timeout_s=60)
+    """
+
+    def __init__(self, *channels):
+        self.channels = channels
+        self.conn = None
+        self._event = asyncio.Event()
+
+    def _on_notify(self, conn, pid, channel, payload):
+        self._event.set()
+
+    async def __aenter__(self):
+        self.conn = await asyncpg.connect(**_connect_kwargs())
+        for channel in self.channels:
+            await self.conn.add_listener(channel, self._on_notify)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def wait(self, timeout_s=None) -> bool:
+        """True si llegó una notificación, False si hubo timeout."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
@@ -14,14 +14,72 @@ class Settings:
     SUPABASE_PASSWORD = os.getenv("SUPABASE_PASSWORD")
     SUPABASE_PORT = os.getenv("SUPABASE_PORT")
 
+    # Pool de conexiones compartido (core/pool.py)
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+    DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+    DB_POOL_HEALTHCHECK_S = float(os.getenv("DB_POOL_HEALTHCHECK_S", "30"))
+
+    # Loader de batches académicos: "values" (execute_values) o "copy" (COPY + staging)
+    ACADEMIC_LOADER = os.getenv("ACADEMIC_LOADER", "values")
+
+    # Payload crudo de OpenAlex: "inline" (academic_metadata.raw_source) o "side" (academic_raw_sources comprimido)
+    RAW_SOURCE_STORE = os.getenv("RAW_SOURCE_STORE", "inline")
+
+    # Pipeline de ingest académico: procesos de normalización (0 = en el hilo de fetch)
+    # y batches en vuelo entre etapas
+    ACADEMIC_NORMALIZE_WORKERS = int(os.getenv("ACADEMIC_NORMALIZE_WORKERS", "2"))
+    ACADEMIC_PIPELINE_DEPTH = int(os.getenv("ACADEMIC_PIPELINE_DEPTH", "2"))
+
+    # ingest-academic con rango de años: procesos (un año cada uno) por defecto
+    ACADEMIC_YEAR_WORKERS = int(os.getenv("ACADEMIC_YEAR_WORKERS", "4"))
+
+    # enrich-authors: peticiones concurrentes a /authors y re-enriquecimiento (días; 0 = nunca)
+    AUTHOR_ENRICH_WORKERS = int(os.getenv("AUTHOR_ENRICH_WORKERS", "4"))
+    AUTHOR_ENRICH_STALE_DAYS = int(os.getenv("AUTHOR_ENRICH_STALE_DAYS", "0"))
+
+    # Lease (segundos) de las filas reclamadas por cada worker web
+    CRAWL_LEASE_S = int(os.getenv("CRAWL_LEASE_S", "600"))
+    NORMALIZE_LEASE_S = int(os.getenv("NORMALIZE_LEASE_S", "300"))
+    EMBED_LEASE_S = int(os.getenv("EMBED_LEASE_S", "900"))
+
+    # Reintentos de las colas web: backoff exponencial y dead-letter tras QUEUE_MAX_ATTEMPTS fallos
+    QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))
+    QUEUE_BACKOFF_BASE_S = int(os.getenv("QUEUE_BACKOFF_BASE_S", "60"))
+    QUEUE_BACKOFF_MAX_S = int(os.getenv("QUEUE_BACKOFF_MAX_S", "21600"))
+
     CHROMA_API_KEY = os.getenv("CHROMA_API_KEY")
     CHROMA_TENANT = os.getenv("CHROMA_TENANT")
     CHROMA_DATABASE = os.getenv("CHROMA_DATABASE")
 
+    # Cache HTTP en disco para OpenAlex / SerpAPI (core/http_cache.py)
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", str(ROOT / ".cache" / "http_cache.sqlite"))
+    HTTP_CACHE_TTL_S = int(os.getenv("HTTP_CACHE_TTL_S", str(7 * 24 * 3600)))
+    HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "1024"))
+
     SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
     SERPAPI_ENGINE = os.getenv("SERPAPI_ENGINE", "google")
     SERPAPI_GL = os.getenv("SERPAPI_GL", "mx")
     SERPAPI_HL = os.getenv("SERPAPI_HL", "es")
     OPENALEX_API_KEY = os.getenv("OPENALEX_API_KEY")
 
+    # Harvest en shards (extractor.fetch_work_pages_sharded)
+    OPENALEX_SHARD_WORKERS = int(os.getenv("OPENALEX_SHARD_WORKERS", "4"))
+    OPENALEX_INSTITUTION_CHUNK = int(os.getenv("OPENALEX_INSTITUTION_CHUNK", "50"))
+    OPENALEX_DATE_WINDOWS = int(os.getenv("OPENALEX_DATE_WINDOWS", "1"))
+
+    # Filtro CTI: "client" (is_cti sobre cada página) o "server" (concepts.id en la consulta)
+    OPENALEX_CTI_FILTER = os.getenv("OPENALEX_CTI_FILTER", "client")
+
+    # Clasificador CTI (services/academic_ingestion/classifier.py)
+    # CTI_MIN_SCORE: score mínimo del concepto en el trabajo (0 = cualquiera)
+    # CTI_CONCEPTS_FILE: JSON / JSON-lines de conceptos de OpenAlex para mapear
+    # nombres clave a IDs y expandir por jerarquía (vacío = solo nombres)
+    CTI_MIN_SCORE = float(os.getenv("CTI_MIN_SCORE", "0"))
+    CTI_CONCEPTS_FILE = os.getenv("CTI_CONCEPTS_FILE", "")
+
+    # true = registros completos de OpenAlex (sin select=); útil si se quiere el raw_source íntegro
+    OPENALEX_FULL_RECORDS = os.getenv("OPENALEX_FULL_RECORDS", "false").lower() in ("1", "true", "yes")
+
 settings = Settings()
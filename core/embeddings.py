@@ -1,18 +1,29 @@
 import chromadb
 from core.config import settings
 
-client = chromadb.CloudClient(
-    api_key=settings.CHROMA_API_KEY,
-    tenant=settings.CHROMA_TENANT,
-    database=settings.CHROMA_DATABASE
-)
+_collection = None
 
-collection = client.get_or_create_collection(
-    name="documents"
-)
+
+def get_collection():
+    """
+    Colección "documents" de Chroma Cloud, creada en el primer uso
+    (importar este módulo no abre conexiones ni pide credenciales).
+    """
+    global _collection
+
+    if _collection is None:
+        client = chromadb.CloudClient(
+            api_key=settings.CHROMA_API_KEY,
+            tenant=settings.CHROMA_TENANT,
+            database=settings.CHROMA_DATABASE
+        )
+        _collection = client.get_or_create_collection(
+            name="documents"
+        )
+    return _collection
 
 def store_embedding(document_id, embedding, document_text, metadata=None):
-    collection.upsert(
+    get_collection().upsert(
         ids=[str(document_id)],
         embeddings=[embedding],
         documents=[document_text],   # 👈 MUY IMPORTANTE
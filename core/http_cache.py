@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from core import raw_store
+from core.config import settings
+
+
+# -------------------------
+# Cache HTTP en disco (SQLite)
+# -------------------------
+# Respuestas JSON de OpenAlex / SerpAPI guardadas localmente para que los
+# re-runs de ingest-academic, populate-institutions y serpapi no vuelvan a
+# descargar (ni a pagar) las mismas páginas.
+
+# Parámetros que no forman parte de la identidad de la petición
+_SECRET_PARAMS = {"api_key", "mailto"}
+
+
+def cache_key(url, params=None):
+    """
+    Clave estable para una petición GET: URL sin query + parámetros ordenados,
+    sin credenciales (la misma consulta con otra API key comparte entrada).
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((k, str(v)) for k, v in (params or {}).items() if v is not None)
+    query = sorted((k, v) for k, v in query if k not in _SECRET_PARAMS)
+
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest(), normalized
+
+
+class HttpCache:
+    """
+    Cache clave → cuerpo de respuesta, con TTL y tope de tamaño.
+    Al pasar de max_bytes se expulsan las entradas menos usadas recientemente.
+    El tamaño total se lleva en memoria (no un SUM(size) por escritura); cada
+    SWEEP_EVERY escrituras se barre lo vencido y se recalcula desde la tabla
+    (corrige la deriva si otro proceso comparte el archivo).
+    Una conexión SQLite compartida y protegida con lock (el harvest en shards
+    la usa desde varios hilos).
+    """
+
+    SWEEP_EVERY = 500
+
+    def __init__(self, path, ttl_s, max_bytes):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS http_cache_accessed_idx ON http_cache (accessed_at)")
+
+        self._writes = 0
+        self._total = self._table_size()
+
+    def _table_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT codec, body, created_at FROM http_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            codec, body, created_at = row
+            if created_at + self.ttl_s < now:
+                self._conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+                self._total -= len(body)
+                return None
+
+            self._conn.execute("UPDATE http_cache SET accessed_at = ? WHERE key = ?", (now, key))
+
+        return raw_store.decompress(body, codec)
+
+    def set(self, key, url, data: bytes):
+        now = time.time()
+        codec = raw_store.DEFAULT_CODEC
+        body = raw_store.compress(data, codec)
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM http_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO http_cache (key, url, codec, body, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, url, codec, body, len(body), now, now),
+            )
+            self._total += len(body) - (old[0] if old else 0)
+
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                self._sweep()
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _sweep(self):
+        # lo vencido se borra aquí (get también lo borra al encontrarlo)
+        self._conn.execute("DELETE FROM http_cache WHERE created_at < ?", (time.time() - self.ttl_s,))
+        self._total = self._table_size()
+
+    def _evict(self):
+        # primero lo vencido, luego LRU hasta quedar bajo el tope
+        self._sweep()
+        total = self._total
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM http_cache ORDER BY accessed_at").fetchall()
+        evict = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM http_cache WHERE key = ?", evict)
+        self._total = total
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM http_cache")
+            self._total = 0
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Cache compartido del proceso, o None si HTTP_CACHE_ENABLED está apagado."""
+    global _http_cache
+
+    if not settings.HTTP_CACHE_ENABLED:
+        return None
+
+    if _http_cache is None:
+        with _http_cache_lock:
+            if _http_cache is None:
+                _http_cache = HttpCache(
+                    settings.HTTP_CACHE_PATH,
+                    ttl_s=settings.HTTP_CACHE_TTL_S,
+                    max_bytes=settings.HTTP_CACHE_MAX_MB * 1024 * 1024,
+                )
+    return _http_cache
+
+
+def cached_get_json(url, params=None, timeout=30):
+    """
+    requests.get(url, params).json() pasando por el cache si está activo.
+    Solo se guardan respuestas 2xx.
+    """
+    cache = get_http_cache()
+    key = normalized = None
+
+    if cache is not None:
+        key, normalized = cache_key(url, params)
+        cached = cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    r = requests.get(url, params=params, timeout=timeout)
+    r.raise_for_status()
+
+    if cache is not None:
+        cache.set(key, normalized, r.content)
+
+    return r.json()
@@ -0,0 +1,387 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración es (versión, nombre, SQL) y se aplica una sola vez, en orden,
+dentro de su propia transacción. Las versiones aplicadas quedan registradas
+en pipeline_schema_migrations.
+
+Uso:
+  python main.py migrate            # aplica las pendientes
+  python main.py migrate --status   # muestra aplicadas / pendientes
+"""
+
+from core.database import db_connection
+
+
+MIGRATIONS_TABLE = "pipeline_schema_migrations"
+
+# Clave del advisory lock: evita que dos procesos migren al mismo tiempo
+_MIGRATIONS_LOCK_KEY = "pipeline_schema_migrations"
+
+
+MIGRATIONS = [
+    (
+        1,
+        "base_tables",
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            source_type TEXT NOT NULL,
+            canonical_identifier TEXT NOT NULL UNIQUE,
+            title TEXT,
+            raw_text TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        CREATE TABLE IF NOT EXISTS institutions_catalog (
+            openalex_id TEXT PRIMARY KEY,
+            display_name TEXT,
+            city TEXT,
+            type TEXT,
+            works_count INTEGER,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        CREATE TABLE IF NOT EXISTS authors (
+            openalex_id TEXT PRIMARY KEY,
+            display_name TEXT,
+            orcid TEXT,
+            last_known_institution_id TEXT,
+            works_count INTEGER DEFAULT 0,
+            cited_by_count INTEGER DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        CREATE TABLE IF NOT EXISTS academic_metadata (
+            document_id BIGINT PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+            doi TEXT UNIQUE,
+            journal_name TEXT,
+            publisher TEXT,
+            issn TEXT,
+            publication_year INTEGER,
+            citation_count INTEGER,
+            is_open_access BOOLEAN,
+            open_access_url TEXT,
+            authors JSONB,
+            institutions JSONB,
+            concepts JSONB,
+            raw_source JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        CREATE TABLE IF NOT EXISTS academic_metadata_institutions (
+            document_id BIGINT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+            institution_openalex_id TEXT NOT NULL,
+            PRIMARY KEY (document_id, institution_openalex_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS academic_metadata_authors (
+            academic_metadata_id BIGINT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+            author_openalex_id TEXT NOT NULL,
+            author_position TEXT,
+            raw_affiliation TEXT,
+            PRIMARY KEY (academic_metadata_id, author_openalex_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS web_metadata (
+            document_id BIGINT PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+            url TEXT,
+            content_type TEXT,
+            data JSONB,
+            embedded_at TIMESTAMPTZ,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """,
+    ),
+    (
+        2,
+        "queue_lease_columns",
+        """
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS crawl_lease_until TIMESTAMPTZ;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS normalize_lease_until TIMESTAMPTZ;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS embed_lease_until TIMESTAMPTZ;
+        """,
+    ),
+    (
+        3,
+        "web_metadata_search_tsv",
+        """
+        ALTER TABLE web_metadata
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('spanish', COALESCE(data->>'cleaned_text', ''))
+        ) STORED;
+
+        CREATE INDEX IF NOT EXISTS web_metadata_search_tsv_idx
+        ON web_metadata USING GIN (search_tsv);
+        """,
+    ),
+    (
+        4,
+        "queue_partial_indexes",
+        # Los predicados de los índices parciales replican textualmente los WHERE
+        # de core.database.fetch_* para que el planner pueda usarlos.
+        """
+        -- crawl: source_type = 'serpapi' AND raw_text IS NULL ORDER BY created_at DESC
+        CREATE INDEX IF NOT EXISTS documents_crawl_queue_idx
+        ON documents (created_at DESC)
+        WHERE source_type = 'serpapi' AND raw_text IS NULL;
+
+        -- normalize: documentos serpapi ya crawleados
+        CREATE INDEX IF NOT EXISTS documents_crawled_serpapi_idx
+        ON documents (created_at DESC)
+        WHERE source_type = 'serpapi' AND raw_text IS NOT NULL;
+
+        -- normalize: cleaned_text vacío o versión distinta de det_v1
+        CREATE INDEX IF NOT EXISTS web_metadata_refresh_queue_idx
+        ON web_metadata (document_id)
+        WHERE (
+            COALESCE(data->>'cleaned_text','') = ''
+            OR COALESCE(data->>'version','') <> 'det_v1'
+        );
+
+        -- embed: cleaned_text presente y embedded_at IS NULL ORDER BY created_at DESC
+        CREATE INDEX IF NOT EXISTS web_metadata_embed_queue_idx
+        ON web_metadata (created_at DESC)
+        WHERE embedded_at IS NULL AND COALESCE(data->>'cleaned_text', '') <> '';
+
+        -- lookups inversos de las tablas pivote (index_authors / index_institutions)
+        CREATE INDEX IF NOT EXISTS academic_metadata_authors_author_idx
+        ON academic_metadata_authors (author_openalex_id);
+
+        CREATE INDEX IF NOT EXISTS academic_metadata_institutions_institution_idx
+        ON academic_metadata_institutions (institution_openalex_id);
+
+        CREATE INDEX IF NOT EXISTS authors_last_known_institution_idx
+        ON authors (last_known_institution_id)
+        WHERE last_known_institution_id IS NOT NULL;
+        """,
+    ),
+    (
+        5,
+        "academic_raw_sources",
+        # Payload crudo de OpenAlex comprimido (zstd/zlib), fuera de academic_metadata
+        """
+        CREATE TABLE IF NOT EXISTS academic_raw_sources (
+            openalex_id TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            payload BYTEA NOT NULL,
+            raw_size INTEGER,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        -- el payload ya viene comprimido: evitar que TOAST intente recomprimirlo
+        ALTER TABLE academic_raw_sources ALTER COLUMN payload SET STORAGE EXTERNAL;
+        """,
+    ),
+    (
+        6,
+        "academic_ingest_runs",
+        # Checkpoints de bulk_insert_works (cursor de OpenAlex + batch) para --resume
+        """
+        CREATE TABLE IF NOT EXISTS academic_ingest_runs (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            year INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            openalex_cursor TEXT DEFAULT '*',
+            batch_number INTEGER NOT NULL DEFAULT 0,
+            total_processed INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ
+        );
+
+        CREATE INDEX IF NOT EXISTS academic_ingest_runs_year_idx
+        ON academic_ingest_runs (year, started_at DESC);
+        """,
+    ),
+    (
+        7,
+        "queue_attempts",
+        # Por etapa: intentos, último error, próximo intento (backoff) y dead-letter
+        """
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS crawl_attempts INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS crawl_last_error TEXT;
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS crawl_next_attempt_at TIMESTAMPTZ;
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS crawl_dead_at TIMESTAMPTZ;
+
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS normalize_attempts INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS normalize_last_error TEXT;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS normalize_next_attempt_at TIMESTAMPTZ;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS normalize_dead_at TIMESTAMPTZ;
+
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS embed_attempts INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS embed_last_error TEXT;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS embed_next_attempt_at TIMESTAMPTZ;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS embed_dead_at TIMESTAMPTZ;
+
+        -- la cola de crawl ya no incluye las filas en dead-letter
+        DROP INDEX IF EXISTS documents_crawl_queue_idx;
+        CREATE INDEX IF NOT EXISTS documents_crawl_queue_idx
+        ON documents (created_at DESC)
+        WHERE source_type = 'serpapi' AND raw_text IS NULL AND crawl_dead_at IS NULL;
+
+        DROP INDEX IF EXISTS web_metadata_embed_queue_idx;
+        CREATE INDEX IF NOT EXISTS web_metadata_embed_queue_idx
+        ON web_metadata (created_at DESC)
+        WHERE embedded_at IS NULL AND embed_dead_at IS NULL AND COALESCE(data->>'cleaned_text', '') <> '';
+        """,
+    ),
+    (
+        8,
+        "web_metadata_promoted_columns",
+        # cleaned_text / version / entity_type / content_hash salen del JSONB a columnas:
+        # las colas y el FTS ya no detoastean data completo para evaluar un predicado
+        """
+        -- search_tsv se regenera desde la columna cleaned_text
+        DROP INDEX IF EXISTS web_metadata_search_tsv_idx;
+        ALTER TABLE web_metadata DROP COLUMN IF EXISTS search_tsv;
+
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS cleaned_text TEXT;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS version TEXT;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS entity_type TEXT;
+        ALTER TABLE web_metadata ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+        -- backfill (mismo cálculo que core.database._UPSERT_WEB_METADATA_SQL)
+        UPDATE web_metadata
+        SET cleaned_text = data->>'cleaned_text',
+            version = data->>'version',
+            entity_type = data->>'entity_type',
+            content_hash = md5(data::text),
+            data = data - 'cleaned_text'
+        WHERE data IS NOT NULL;
+
+        ALTER TABLE web_metadata
+        ADD COLUMN search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('spanish', COALESCE(cleaned_text, ''))
+        ) STORED;
+
+        CREATE INDEX IF NOT EXISTS web_metadata_search_tsv_idx
+        ON web_metadata USING GIN (search_tsv);
+
+        -- índices parciales de las colas sobre las columnas nuevas
+        DROP INDEX IF EXISTS web_metadata_refresh_queue_idx;
+        CREATE INDEX IF NOT EXISTS web_metadata_refresh_queue_idx
+        ON web_metadata (document_id)
+        WHERE (
+            COALESCE(cleaned_text,'') = ''
+            OR COALESCE(version,'') <> 'det_v1'
+        );
+
+        DROP INDEX IF EXISTS web_metadata_embed_queue_idx;
+        CREATE INDEX IF NOT EXISTS web_metadata_embed_queue_idx
+        ON web_metadata (created_at DESC)
+        WHERE embedded_at IS NULL AND embed_dead_at IS NULL AND COALESCE(cleaned_text, '') <> '';
+        """,
+    ),
+    (
+        9,
+        "academic_ingest_runs_incremental",
+        # Runs incrementales (sync-academic): sin año, filtrados por from_updated_date
+        """
+        ALTER TABLE academic_ingest_runs ALTER COLUMN year DROP NOT NULL;
+        ALTER TABLE academic_ingest_runs ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'year';
+        ALTER TABLE academic_ingest_runs ADD COLUMN IF NOT EXISTS updated_since TIMESTAMPTZ;
+
+        CREATE INDEX IF NOT EXISTS academic_ingest_runs_kind_idx
+        ON academic_ingest_runs (kind, status, started_at DESC);
+        """,
+    ),
+    (
+        10,
+        "authors_enrichment",
+        # Autores con works_count / cited_by_count / institución desde /authors de OpenAlex
+        # (enrich-authors); enriched_at IS NULL = pendiente
+        """
+        ALTER TABLE authors ADD COLUMN IF NOT EXISTS enriched_at TIMESTAMPTZ;
+
+        CREATE INDEX IF NOT EXISTS authors_enrich_pending_idx
+        ON authors (openalex_id)
+        WHERE enriched_at IS NULL;
+        """,
+    ),
+    (
+        11,
+        "academic_ingest_runs_options",
+        # Opciones con las que se generó el cursor (--resume las valida) y
+        # runs sharded (sin cursor único: nunca se retoman)
+        """
+        ALTER TABLE academic_ingest_runs ADD COLUMN IF NOT EXISTS sharded BOOLEAN NOT NULL DEFAULT FALSE;
+        ALTER TABLE academic_ingest_runs ADD COLUMN IF NOT EXISTS cti_filter TEXT;
+        ALTER TABLE academic_ingest_runs ADD COLUMN IF NOT EXISTS full_records BOOLEAN;
+        """,
+    ),
+]
+
+
+# -------------------------
+# Runner
+# -------------------------
+def _ensure_migrations_table(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def applied_versions():
+    with db_connection() as conn, conn.cursor() as cur:
+        _ensure_migrations_table(cur)
+        cur.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+        return {row[0] for row in cur.fetchall()}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def migrate(target=None):
+    """
+    Aplica las migraciones pendientes hasta `target` (inclusive; None = todas).
+    Devuelve la lista de versiones aplicadas.
+    """
+    applied_now = []
+
+    for version, name, sql in MIGRATIONS:
+        if target is not None and version > target:
+            break
+
+        with db_connection() as conn, conn.cursor() as cur:
+            _ensure_migrations_table(cur)
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (_MIGRATIONS_LOCK_KEY,))
+
+            # Re-verificar con el lock tomado (otro proceso pudo aplicarla)
+            cur.execute(f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE version = %s", (version,))
+            if cur.fetchone():
+                continue
+
+            print(f"   🛠️ Aplicando migración {version:03d}_{name}...")
+            cur.execute(sql)
+            cur.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+
+        applied_now.append(version)
+
+    return applied_now
+
+
+def print_status():
+    applied = applied_versions()
+    for version, name, _ in MIGRATIONS:
+        mark = "✅" if version in applied else "⏳"
+        print(f"   {mark} {version:03d}_{name}")
@@ -0,0 +1,77 @@
+import select
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from core.pool import connect_kwargs
+
+
+# -------------------------
+# Canales entre etapas del pipeline web
+# -------------------------
+CHANNEL_WEB_DISCOVERED = "web_discovered"   # serpapi → crawl
+CHANNEL_WEB_CRAWLED = "web_crawled"         # crawl → normalize
+CHANNEL_WEB_NORMALIZED = "web_normalized"   # normalize → embed
+
+
+def notify(cur, channel, payload=""):
+    """
+    Publica un NOTIFY dentro de la transacción de `cur`.
+    Postgres lo entrega solo cuando la transacción hace commit.
+    """
+    cur.execute("SELECT pg_notify(%s, %s)", (channel, str(payload)))
+
+
+# -------------------------
+# Listener (bloqueante)
+# -------------------------
+class Listener:
+    """
+    Conexión dedicada (fuera del pool) que hace LISTEN en uno o más canales:
+
+        with Listener(CHANNEL_WEB_CRAWLED) as listener:
+            while True:
+                if not process_pending():
+                    listener.wait(timeout_s=60)
+
+    Hacer LISTEN antes de revisar la cola evita perder avisos entre
+    el SELECT vacío y el wait.
+    """
+
+    def __init__(self, *channels):
+        self.channels = channels
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = psycopg2.connect(**connect_kwargs())
+        self.conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cur:
+            for channel in self.channels:
+                cur.execute(f'LISTEN "{channel}"')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def wait(self, timeout_s=None):
+        """
+        Bloquea hasta recibir al menos una notificación o hasta timeout_s.
+        Devuelve la lista de notificaciones (vacía si hubo timeout).
+        """
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+
+        while True:
+            self.conn.poll()
+            if self.conn.notifies:
+                notifies = list(self.conn.notifies)
+                self.conn.notifies.clear()
+                return notifies
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+
+            select.select([self.conn], [], [], remaining)
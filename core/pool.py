@@ -0,0 +1,180 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
+
+from core.config import settings
+
+
+# -------------------------
+# Connection kwargs
+# -------------------------
+def connect_kwargs():
+    return dict(
+        host=settings.SUPABASE_HOST,
+        database=settings.SUPABASE_DB,
+        user=settings.SUPABASE_USER,
+        password=settings.SUPABASE_PASSWORD,
+        port=int(settings.SUPABASE_PORT or 5432),
+        sslmode="require",
+        # mantener viva la conexión SSL mientras está en el pool
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+
+
+# -------------------------
+# Pool
+# -------------------------
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe hacia Supabase.
+    - Reusa conexiones (evita el handshake TCP+TLS+auth por llamada)
+    - Bloquea hasta `timeout_s` cuando todas las conexiones están en uso
+    - Health check (SELECT 1) de conexiones que estuvieron ociosas
+    """
+
+    def __init__(self, minconn=None, maxconn=None, timeout_s=None, healthcheck_s=None, **kwargs):
+        self.minconn = settings.DB_POOL_MIN if minconn is None else minconn
+        self.maxconn = settings.DB_POOL_MAX if maxconn is None else maxconn
+        self.timeout_s = settings.DB_POOL_TIMEOUT_S if timeout_s is None else timeout_s
+        self.healthcheck_s = settings.DB_POOL_HEALTHCHECK_S if healthcheck_s is None else healthcheck_s
+
+        self._pool = pg_pool.ThreadedConnectionPool(
+            self.minconn, self.maxconn, **(kwargs or connect_kwargs())
+        )
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+
+        # conexión recién creada o usada hace poco: no vale la pena el round trip
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_s:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout_s):
+            raise pg_pool.PoolError(
+                f"Pool agotado: {self.maxconn} conexiones en uso por más de {self.timeout_s}s"
+            )
+
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                # conexión rota (timeout del servidor, red, etc.) → reemplazar
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        close = bool(conn.closed)
+
+        if not close:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        with self._lock:
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, commit: bool = True):
+        """
+        Presta una conexión del pool.
+        - commit=True: hace commit al salir sin errores
+        - Cualquier excepción hace rollback y se re-lanza
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            if commit:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    @contextmanager
+    def cursor(self, commit: bool = True, **cursor_kwargs):
+        with self.connection(commit=commit) as conn:
+            with conn.cursor(**cursor_kwargs) as cur:
+                yield cur
+
+    def close(self):
+        self._pool.closeall()
+
+
+# -------------------------
+# Pool compartido del proceso
+# -------------------------
+_shared_pool = None
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Devuelve el pool del proceso (creación perezosa).
+    Después de un fork se crea un pool nuevo: las conexiones SSL
+    del proceso padre no pueden compartirse.
+    """
+    global _shared_pool, _shared_pid
+
+    pid = os.getpid()
+    if _shared_pool is not None and _shared_pid == pid:
+        return _shared_pool
+
+    with _shared_lock:
+        if _shared_pool is None or _shared_pid != pid:
+            _shared_pool = ConnectionPool()
+            _shared_pid = pid
+    return _shared_pool
+
+
+def close_pool():
+    global _shared_pool, _shared_pid
+
+    with _shared_lock:
+        if _shared_pool is not None and _shared_pid == os.getpid():
+            _shared_pool.close()
+        _shared_pool = None
+        _shared_pid = None
+
+
+atexit.register(close_pool)
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional; zlib viene con Python
+    zstandard = None
+
+
+# -------------------------
+# Codecs
+# -------------------------
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress(data: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Codec 'zstd' requiere el paquete zstandard")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f"Codec desconocido: '{codec}'")
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Codec 'zstd' requiere el paquete zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    raise ValueError(f"Codec desconocido: '{codec}'")
+
+
+# -------------------------
+# Payloads
+# -------------------------
+def canonical_json(payload) -> bytes:
+    # sort_keys: el mismo trabajo siempre produce los mismos bytes (y el mismo hash)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def decode_payload(blob: bytes, codec: str):
+    return json.loads(decompress(bytes(blob), codec))
@@ -1,33 +1,32 @@
-from services.academic_ingestion.ingest import ingest_openalex
-from services.web_ingestion.ingest import ingest_web_seeds_from_serpapi
-
 #!/usr/bin/env python
 """
 Script principal para el Hackathon Ultra Secreto
 Uso: python main.py [comando] [opciones]
 
 Comandos disponibles:
-  ingest-academic [año]    - Ingestar datos académicos para un año específico
+  ingest-academic [años]   - Ingestar datos académicos (un año o rango AAAA-AAAA)
+  sync-academic [--since F] - Sync incremental (trabajos actualizados desde el último sync)
   populate-vector-db [n]    - Poblar ChromaDB (n = límite opcional de trabajos)
   populate-institutions     - Poblar tabla de instituciones
-  all [año] [n]            - Ejecutar todo el pipeline (ingest + instituciones + vectores)
+  enrich-authors [n]        - Completar estadísticas de autores desde OpenAlex
+  migrate [--status]        - Aplicar migraciones del esquema (tablas e índices)
+  all [años] [n]           - Ejecutar todo el pipeline (ingest + instituciones + autores + vectores)
 
 Ejemplos:
   python main.py ingest-academic 2026
+  python main.py ingest-academic 2015-2026 --workers 4
   python main.py populate-vector-db 1000
   python main.py populate-institutions
   python main.py all 2026 500
+
+Los módulos de cada comando (psycopg2, pyalex, chromadb, ...) se importan
+dentro de su función: `help` no carga nada y cada comando solo lo que usa.
+Tiempos de arranque: python scripts/bench_startup.py
 """
 
-from services.web_ingestion.ingest import ingest_web_example
-from services.academic_ingestion.ingest import bulk_insert_works
-from core.database import bulk_insert_institutions
-from scripts.populate_chromadb import populate_chromadb
-from scripts.populate_institutions import populate_institutions
-from services.academic_ingestion.extractor import fetch_works
 import sys
-import argparse
 import time
+from datetime import date
 
 def print_header(title):
     """Imprime un encabezado formateado"""
@@ -43,13 +42,17 @@ def print_error(message):
     """Imprime un mensaje de error"""
     print(f"❌ {message}")
 
-def ingest_academic(year):
+def ingest_academic(year, loader=None, raw_store_mode=None, resume=False, sharded=False, cti_filter=None,
+                    full_records=None):
     """Ingesta datos académicos para un año específico"""
     print_header(f"Ingestando datos académicos para el año {year}")
     
     start_time = time.perf_counter()
     try:
-        bulk_insert_works(year)
+        from services.academic_ingestion.ingest import bulk_insert_works
+
+        bulk_insert_works(year, loader=loader, raw_store_mode=raw_store_mode, resume=resume, sharded=sharded,
+                          cti_filter=cti_filter, full_records=full_records)
         end_time = time.perf_counter()
         print_success(f"Ingesta académica completada en {end_time - start_time:.2f} segundos")
         return True
@@ -57,6 +60,80 @@ def ingest_academic(year):
         print_error(f"Error en ingesta académica: {e}")
         return False
 
+def ingest_academic_years(years, workers=None, **flags):
+    """Ingesta varios años en paralelo (un proceso por año)"""
+    print_header(f"Ingestando datos académicos para {years[0]}–{years[-1]}")
+    
+    start_time = time.perf_counter()
+    try:
+        from services.academic_ingestion.ingest import ingest_years
+
+        results = ingest_years(years, workers=workers, **flags)
+        end_time = time.perf_counter()
+        failed = [r["year"] for r in results if not r["ok"]]
+        if failed:
+            print_error(f"{len(failed)}/{len(results)} años fallaron: {', '.join(str(y) for y in failed)}")
+            return False
+        print_success(f"Ingesta académica de {len(results)} años completada en {end_time - start_time:.2f} segundos")
+        return True
+    except Exception as e:
+        print_error(f"Error en ingesta académica: {e}")
+        return False
+
+def run_ingest(years, workers=None, **flags):
+    """Un año: ingest_academic en este proceso; varios: ingest_academic_years"""
+    if len(years) == 1:
+        return ingest_academic(years[0], **flags)
+    return ingest_academic_years(years, workers=workers, **flags)
+
+def parse_years(value):
+    """'2026' → [2026]; '2015-2026' → [2015, ..., 2026]"""
+    if "-" in value:
+        start, end = (int(part) for part in value.split("-", 1))
+        if start > end:
+            raise ValueError(f"Rango de años invertido: {value}")
+        return list(range(start, end + 1))
+    return [int(value)]
+
+def parse_workers(args):
+    """--workers N (procesos para un rango de años)"""
+    if "--workers" not in args:
+        return None
+    i = args.index("--workers")
+    if i + 1 >= len(args):
+        raise ValueError("--workers requiere un número")
+    workers = int(args[i + 1])
+    if workers < 1:
+        raise ValueError("--workers debe ser al menos 1")
+    return workers
+
+def parse_ingest_flags(args):
+    """Flags compartidos por ingest-academic y sync-academic"""
+    return {
+        "loader": "copy" if "--copy" in args else None,
+        "raw_store_mode": "side" if "--raw-side-store" in args else None,
+        "resume": "--resume" in args,
+        "sharded": "--sharded" in args,
+        "cti_filter": "server" if "--cti-server" in args else None,
+        "full_records": True if "--full-records" in args else None,
+    }
+
+def sync_academic(since=None, **flags):
+    """Sync incremental de datos académicos (from_updated_date)"""
+    print_header("Sync incremental de datos académicos")
+    
+    start_time = time.perf_counter()
+    try:
+        from services.academic_ingestion.ingest import sync_updated_works
+
+        sync_updated_works(since=since, **flags)
+        end_time = time.perf_counter()
+        print_success(f"Sync académico completado en {end_time - start_time:.2f} segundos")
+        return True
+    except Exception as e:
+        print_error(f"Error en sync académico: {e}")
+        return False
+
 def run_populate_vector_db(limit=None):
     """Pobla ChromaDB con datos de la base de datos"""
     print_header("Poblando ChromaDB")
@@ -66,6 +143,8 @@ def run_populate_vector_db(limit=None):
     
     start_time = time.perf_counter()
     try:
+        from scripts.populate_chromadb import populate_chromadb
+
         populate_chromadb(limit_works=limit)
         end_time = time.perf_counter()
         print_success(f"Población de ChromaDB completada en {end_time - start_time:.2f} segundos")
@@ -80,6 +159,8 @@ def run_populate_institutions():
     
     start_time = time.perf_counter()
     try:
+        from scripts.populate_institutions import populate_institutions
+
         populate_institutions()
         end_time = time.perf_counter()
         print_success(f"Población de instituciones completada en {end_time - start_time:.2f} segundos")
@@ -88,18 +169,56 @@ def run_populate_institutions():
         print_error(f"Error poblando instituciones: {e}")
         return False
 
-def run_all_pipeline(year, vector_limit=None):
+def run_enrich_authors(limit=None):
+    """Completa works_count / cited_by_count / institución de los autores"""
+    print_header("Enriqueciendo autores")
+    
+    start_time = time.perf_counter()
+    try:
+        from services.academic_ingestion.authors import enrich_authors
+
+        enrich_authors(limit=limit)
+        end_time = time.perf_counter()
+        print_success(f"Enriquecimiento de autores completado en {end_time - start_time:.2f} segundos")
+        return True
+    except Exception as e:
+        print_error(f"Error enriqueciendo autores: {e}")
+        return False
+
+def run_migrations(status_only=False):
+    """Aplica (o lista) las migraciones del esquema"""
+    print_header("Migraciones del esquema")
+    
+    try:
+        from core.migrations import migrate, print_status
+
+        if not status_only:
+            applied = migrate()
+            if applied:
+                print_success(f"Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
+            else:
+                print_success("El esquema ya está al día")
+        print_status()
+        return True
+    except Exception as e:
+        print_error(f"Error aplicando migraciones: {e}")
+        return False
+
+def run_all_pipeline(years, vector_limit=None, workers=None):
     """
     Ejecuta todo el pipeline:
-    1. Ingesta académica
+    1. Ingesta académica (uno o varios años)
     2. Población de instituciones
-    3. Población de ChromaDB
+    3. Enriquecimiento de autores
+    4. Población de ChromaDB
     """
-    print_header(f"Ejecutando pipeline completo para el año {year}")
+    scope = f"el año {years[0]}" if len(years) == 1 else f"los años {years[0]}–{years[-1]}"
+    print_header(f"Ejecutando pipeline completo para {scope}")
     
     steps = [
-        ("📚 Ingesta académica", lambda: ingest_academic(year)),
+        ("📚 Ingesta académica", lambda: run_ingest(years, workers=workers)),
         ("🏛️ Población de instituciones", run_populate_institutions),
+        ("👥 Enriquecimiento de autores", run_enrich_authors),
         ("🗄️ Población de ChromaDB", lambda: run_populate_vector_db(vector_limit))
     ]
     
@@ -138,8 +257,25 @@ USO:
 
 COMANDOS DISPONIBLES:
 
-  ingest-academic [AÑO]      Ingestar datos académicos para un año específico
+  ingest-academic AÑO|AÑO-AÑO
+                              Ingestar datos académicos para un año o un rango de años
       Ejemplo: python main.py ingest-academic 2026
+      Ejemplo: python main.py ingest-academic 2015-2026 --workers 4
+      --workers N              Con rango: años en paralelo, un proceso por año
+                               (por defecto ACADEMIC_YEAR_WORKERS). Un año que falla
+                               no detiene a los demás; se retoma con --resume
+      --copy                   Cargar batches con COPY + tablas staging
+      --raw-side-store         Guardar el payload crudo comprimido en academic_raw_sources
+      --resume                 Continuar el último run fallido/interrumpido desde su checkpoint
+      --sharded                Harvest paralelo por chunks de instituciones (OPENALEX_SHARD_WORKERS hilos)
+      --cti-server             Filtrar conceptos CTI en OpenAlex (menos páginas descargadas)
+      --full-records           Descargar registros completos (sin select=) para el raw_source
+
+  sync-academic [--since AAAA-MM-DD]
+                              Traer solo trabajos actualizados en OpenAlex desde el último
+                              sync completado (todos los años). --since es obligatorio la
+                              primera vez. Acepta los mismos flags que ingest-academic.
+      Ejemplo: python main.py sync-academic --since 2026-01-01
 
   populate-vector-db [N]      Poblar ChromaDB (N = límite opcional de trabajos)
       Ejemplo: python main.py populate-vector-db 1000
@@ -147,8 +283,17 @@ COMANDOS DISPONIBLES:
   populate-institutions       Poblar la tabla de instituciones
       Ejemplo: python main.py populate-institutions
 
-  all [AÑO] [N]               Ejecutar todo el pipeline completo
+  enrich-authors [N]          Completar works_count, cited_by_count e institución de los
+                              autores pendientes (batches de 100 IDs a /authors de OpenAlex)
+      Ejemplo: python main.py enrich-authors
+
+  migrate [--status]          Aplicar migraciones del esquema (tablas e índices)
+      Ejemplo: python main.py migrate
+
+  all AÑO|AÑO-AÑO [N] [--workers N]
+                              Ejecutar todo el pipeline completo
       Ejemplo: python main.py all 2026 500
+      Ejemplo: python main.py all 2020-2026 --workers 4
 
   help                        Mostrar esta ayuda
 
@@ -165,8 +310,11 @@ EJEMPLOS RÁPIDOS:
   # Pipeline completo para 2025
   python main.py all 2025
 
+  # Backfill 2000–2026, 4 años a la vez
+  python main.py ingest-academic 2000-2026 --workers 4
+
 NOTAS:
-  - El año en ingest-academic y all es obligatorio
+  - El año (o rango de años) en ingest-academic y all es obligatorio
   - El límite en populate-vector-db es opcional
   - Los comandos ejecutan transacciones que pueden revertirse en caso de error
 """
@@ -194,10 +342,28 @@ def main():
             return
         
         try:
-            year = int(sys.argv[2])
-            ingest_academic(year)
-        except ValueError:
-            print_error("El año debe ser un número válido")
+            years = parse_years(sys.argv[2])
+            workers = parse_workers(sys.argv[3:])
+        except ValueError as e:
+            print_error(f"El año debe ser un número o un rango AAAA-AAAA válido ({e})")
+            return
+        
+        run_ingest(years, workers=workers, **parse_ingest_flags(sys.argv[3:]))
+    
+    elif command == "sync-academic":
+        args = sys.argv[2:]
+        since = None
+        if "--since" in args:
+            i = args.index("--since")
+            if i + 1 >= len(args):
+                print_error("--since requiere una fecha (AAAA-MM-DD)")
+                return
+            try:
+                since = date.fromisoformat(args[i + 1])
+            except ValueError:
+                print_error("--since debe tener formato AAAA-MM-DD")
+                return
+        sync_academic(since=since, **parse_ingest_flags(args))
     
     elif command == "populate-vector-db":
         limit = None
@@ -213,6 +379,20 @@ def main():
     elif command == "populate-institutions":
         run_populate_institutions()
     
+    elif command == "enrich-authors":
+        limit = None
+        if len(sys.argv) > 2:
+            try:
+                limit = int(sys.argv[2])
+            except ValueError:
+                print_error("El límite debe ser un número válido")
+                return
+        
+        run_enrich_authors(limit)
+    
+    elif command == "migrate":
+        run_migrations(status_only="--status" in sys.argv[2:])
+    
     elif command == "all":
         if len(sys.argv) < 3:
             print_error("Debes especificar un año para el pipeline")
@@ -220,16 +400,20 @@ def main():
             return
         
         try:
-            year = int(sys.argv[2])
+            years = parse_years(sys.argv[2])
+            workers = parse_workers(sys.argv[3:])
             vector_limit = None
-            if len(sys.argv) > 3:
+            if len(sys.argv) > 3 and not sys.argv[3].startswith("--"):
                 vector_limit = int(sys.argv[3])
-            
-            run_all_pipeline(year, vector_limit)
         except ValueError:
             print_error("El año y el límite deben ser números válidos")
+            return
+        
+        run_all_pipeline(years, vector_limit, workers=workers)
     
     elif command == "serpapi":
+      from services.web_ingestion.ingest import ingest_web_seeds_from_serpapi
+
       ingest_web_seeds_from_serpapi("Directorio del cinestav nuevo leon", num_results=10, page_limit=1)
     
     else:
@@ -0,0 +1,102 @@
+"""
+Benchmark del clasificador CTI.
+
+Compara el is_cti original (lista de keywords recorrida por cada trabajo)
+contra ConceptClassifier.classify_page sobre trabajos sintéticos armados con
+los conceptos de concepts_output.json (una lista de conceptos por línea =
+un trabajo). No usa red ni base de datos.
+
+Uso:
+  python scripts/bench_classifier.py [--file concepts_output.json] [--repeat N] [--min-score S]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.academic_ingestion.classifier import CTI_KEYWORDS, ConceptClassifier, load_concepts_file  # noqa: E402
+
+
+def legacy_is_cti(work, keywords):
+    # copia de extractor.is_cti antes del clasificador compilado
+    concepts = []
+    if isinstance(work.get("concepts"), list):
+        concepts = [
+            c.get("display_name").lower()
+            for c in work["concepts"]
+            if isinstance(c, dict) and c.get("display_name")
+        ]
+
+    if any(keyword in concepts for keyword in keywords):
+        return True
+
+    return False
+
+
+def load_works(path):
+
+    works = []
+    for i, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines()):
+        if line.strip():
+            works.append({"id": f"W{i}", "concepts": json.loads(line)})
+    return works
+
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo por trabajo del clasificador CTI")
+    parser.add_argument("--file", default=str(ROOT / "concepts_output.json"))
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones (se toma la mejor)")
+    parser.add_argument("--min-score", type=float, default=0.0)
+    args = parser.parse_args()
+
+    works = load_works(args.file)
+    if not works:
+        print(f"❌ Sin trabajos en {args.file}")
+        return
+
+    start = time.perf_counter()
+    classifier = ConceptClassifier(CTI_KEYWORDS, min_score=args.min_score, hierarchy=load_concepts_file(args.file))
+    compile_s = time.perf_counter() - start
+
+    # la lista original tenía 'application' 'innovation' pegados por una coma faltante
+    legacy_keywords = [k for k in CTI_KEYWORDS if k not in ("application", "innovation")]
+    legacy_keywords.append("applicationinnovation")
+
+    legacy_s, legacy = timed(lambda: [legacy_is_cti(w, legacy_keywords) for w in works], args.repeat)
+    fixed_s, fixed = timed(lambda: [legacy_is_cti(w, CTI_KEYWORDS) for w in works], args.repeat)
+    page_s, compiled = timed(lambda: classifier.classify_page(works), args.repeat)
+
+    n = len(works)
+    print("=" * 60)
+    print(f"⏱️ Clasificador CTI: {n} trabajos, mejor de {args.repeat}")
+    print("=" * 60)
+    print(f"   compilación:           {compile_s * 1000:.2f} ms ({len(classifier.names)} nombres, {len(classifier.ids)} IDs)")
+    print(f"   is_cti original:       {legacy_s / n * 1e6:.2f} µs/trabajo  ({sum(legacy)} CTI)")
+    print(f"   is_cti lista corregida:{fixed_s / n * 1e6:.2f} µs/trabajo  ({sum(fixed)} CTI)")
+    print(f"   classify_page:         {page_s / n * 1e6:.2f} µs/trabajo  ({sum(compiled)} CTI)")
+    if page_s:
+        print(f"   aceleración:           {legacy_s / page_s:.1f}x")
+
+    if not args.min_score and fixed != compiled:
+        diff = sum(a != b for a, b in zip(fixed, compiled))
+        print(f"⚠️ {diff} trabajos clasificados distinto que is_cti con la lista corregida")
+
+
+if __name__ == "__main__":
+    main()
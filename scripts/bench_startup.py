@@ -0,0 +1,93 @@
+"""
+Benchmark de arranque de main.py.
+
+Mide, en procesos nuevos (sin caché de imports):
+  1. `python main.py help` de punta a punta
+  2. el import de cada módulo que carga un comando
+
+No ejecuta comandos con red ni base de datos. Un módulo que falla al importar
+(dependencia no instalada) se reporta como error en vez de abortar.
+
+Uso:
+  python scripts/bench_startup.py [--runs N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# módulo que importa cada comando de main.py
+COMMAND_MODULES = {
+    "help": "main",
+    "serpapi": "services.web_ingestion.ingest",
+    "ingest-academic / sync-academic": "services.academic_ingestion.ingest",
+    "populate-institutions": "scripts.populate_institutions",
+    "enrich-authors": "services.academic_ingestion.authors",
+    "populate-vector-db": "scripts.populate_chromadb",
+    "migrate": "core.migrations",
+}
+
+_IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def time_help(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "main.py", "help"],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_import(module, runs):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["error"])[-1]
+            return None, error
+        samples.append(float(result.stdout.strip()))
+    return samples, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de main.py")
+    parser.add_argument("--runs", type=int, default=5, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"⏱️ Arranque de main.py ({args.runs} corridas, mediana)")
+    print("=" * 60)
+
+    samples = time_help(args.runs)
+    print(f"   python main.py help: {statistics.median(samples) * 1000:.0f} ms")
+
+    print("\n📦 Import por comando:")
+    for command, module in COMMAND_MODULES.items():
+        samples, error = time_import(module, args.runs)
+        if error:
+            print(f"   {command:<32} {module}: ❌ {error}")
+        else:
+            print(f"   {command:<32} {module}: {statistics.median(samples) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Verifica contra la base que el loader COPY (_copy_rows) conserva NULL y
+strings vacíos: un None en la fila debe quedar NULL después del COPY, y
+"" debe quedar como string vacío. También revisa la fila de
+stg_academic_metadata que arma _flush_batch_copy en modo side store
+(raw_source=None, doi=None) contra la tabla de staging real.
+
+Solo usa una tabla temporal y hace rollback al final: no toca datos.
+
+Uso:
+  python scripts/check_copy_nulls.py
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.database import _STAGING_TABLES_SQL, _copy_rows, get_connection  # noqa: E402
+
+COLUMNS = ("label", "text_value", "int_value", "bool_value", "json_value")
+
+ROWS = [
+    ("nulls", None, None, None, None),
+    ("empty", "", 0, False, "[]"),
+    ("literal", r"\N", 3, True, '{"a": "x,\\"y\\""}'),
+]
+
+METADATA_COLUMNS = (
+    "canonical_identifier", "doi", "journal_name", "publisher", "issn",
+    "publication_year", "citation_count", "is_open_access", "open_access_url",
+    "authors", "institutions", "concepts", "raw_source",
+)
+
+# Misma forma que la fila de _flush_batch_copy con --raw-side-store y sin DOI
+METADATA_ROW = (
+    "https://openalex.org/W0", None, None, None, None,
+    None, None, None, None,
+    "[]", "[]", "[]", None,
+)
+
+# label → (text_value IS NULL, text_value, int_value IS NULL, bool_value IS NULL, json_value IS NULL)
+EXPECTED = {
+    "nulls": (True, None, True, True, True),
+    "empty": (False, "", False, False, False),
+    "literal": (False, r"\N", False, False, False),
+    # raw_source, doi, publication_year, is_open_access: todos NULL
+    "stg_academic_metadata (side store)": (True, True, True, True),
+}
+
+
+def main():
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE chk_copy_nulls (
+                    label TEXT,
+                    text_value TEXT,
+                    int_value INTEGER,
+                    bool_value BOOLEAN,
+                    json_value JSONB
+                )
+                """
+            )
+            _copy_rows(cur, "chk_copy_nulls", COLUMNS, ROWS)
+            cur.execute(
+                """
+                SELECT label, text_value IS NULL, text_value, int_value IS NULL,
+                       bool_value IS NULL, json_value IS NULL
+                FROM chk_copy_nulls
+                """
+            )
+            result = {row[0]: tuple(row[1:]) for row in cur.fetchall()}
+
+            cur.execute(_STAGING_TABLES_SQL)
+            _copy_rows(cur, "stg_academic_metadata", METADATA_COLUMNS, [METADATA_ROW])
+            cur.execute(
+                """
+                SELECT raw_source IS NULL, doi IS NULL, publication_year IS NULL, is_open_access IS NULL
+                FROM stg_academic_metadata
+                """
+            )
+            result["stg_academic_metadata (side store)"] = cur.fetchone()
+    finally:
+        conn.rollback()
+        conn.close()
+
+    failed = False
+    for label, expected in EXPECTED.items():
+        if result.get(label) == expected:
+            print(f"✅ {label}: {expected}")
+        else:
+            failed = True
+            print(f"❌ {label}: esperado {expected}, obtenido {result.get(label)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
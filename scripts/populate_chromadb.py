@@ -5,14 +5,14 @@ from pathlib import Path
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from core.database import get_connection
+from core.pool import get_pool
 from services.vector_db.chroma_service import ChromaService
 import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def populate_chromadb(limit_works=None, limit_authors=None, limit_institutions=None, reset=False):
+def populate_chromadb(limit_works=None, limit_authors=None, limit_institutions=None, reset=False, itersize=2000):
     """
     Pobla ChromaDB Cloud con datos de PostgreSQL
     """
@@ -23,12 +23,14 @@ def populate_chromadb(limit_works=None, limit_authors=None, limit_institutions=N
     print(f"   - Tenant: {os.getenv('CHROMA_TENANT')}")
     print(f"   - Database: {os.getenv('CHROMA_DATABASE')}")
     print(f"   - Reset: {reset}")
+    print(f"   - Itersize (filas por FETCH): {itersize}")
     print("=" * 60)
     
     start_time = time.perf_counter()
     
     # Conectar a PostgreSQL
-    conn = get_connection()
+    pool = get_pool()
+    conn = pool.getconn()
     
     # Inicializar servicio ChromaDB Cloud
     chroma = ChromaService(collection_prefix="academic_")
@@ -40,13 +42,13 @@ def populate_chromadb(limit_works=None, limit_authors=None, limit_institutions=N
             chroma.reset_database()
         
         # Indexar trabajos
-        works_count = chroma.index_works(conn, limit=limit_works)
+        works_count = chroma.index_works(conn, limit=limit_works, itersize=itersize)
         
         # # Indexar autores
-        # authors_count = chroma.index_authors(conn, limit=limit_authors)
+        # authors_count = chroma.index_authors(conn, limit=limit_authors, itersize=itersize)
         
         # # Indexar instituciones
-        # institutions_count = chroma.index_institutions(conn, limit=limit_institutions)
+        # institutions_count = chroma.index_institutions(conn, limit=limit_institutions, itersize=itersize)
         
         # Estadísticas finales
         end_time = time.perf_counter()
@@ -66,7 +68,7 @@ def populate_chromadb(limit_works=None, limit_authors=None, limit_institutions=N
         import traceback
         traceback.print_exc()
     finally:
-        conn.close()
+        pool.putconn(conn)
 
 if __name__ == "__main__":
     import argparse
@@ -76,6 +78,7 @@ if __name__ == "__main__":
     parser.add_argument('--limit-authors', type=int, help='Límite de autores a indexar')
     parser.add_argument('--limit-institutions', type=int, help='Límite de instituciones a indexar')
     parser.add_argument('--reset', action='store_true', help='Resetear colecciones antes de indexar')
+    parser.add_argument('--itersize', type=int, default=2000, help='Filas por FETCH del cursor del servidor')
     
     args = parser.parse_args()
     
@@ -83,5 +86,6 @@ if __name__ == "__main__":
         limit_works=args.limit_works,
         limit_authors=args.limit_authors,
         limit_institutions=args.limit_institutions,
-        reset=args.reset
+        reset=args.reset,
+        itersize=args.itersize
     )
\ No newline at end of file
@@ -5,4 +5,5 @@ def populate_institutions():
     print("=" * 60)
     print("🚀 Iniciando población de instituciones")
     print("=" * 60)
-    bulk_insert_institutions(fetch_nuevo_leon_institutions())
\ No newline at end of file
+    stats = bulk_insert_institutions(fetch_nuevo_leon_institutions())
+    print(f"✅ Instituciones: {stats['inserted']} insertadas, {stats['updated']} actualizadas, {stats['unchanged']} sin cambios")
\ No newline at end of file
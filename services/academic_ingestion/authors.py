@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyalex
+from pyalex import Authors
+from core.config import settings
+from core.database import bulk_update_author_stats, fetch_authors_needing_enrichment, format_upsert_stats
+from services.academic_ingestion.extractor import MAX_OR_VALUES
+from services.academic_ingestion.openalex_client import get_page
+
+pyalex.config.api_key = settings.OPENALEX_API_KEY
+
+# Campos que lee _author_row
+AUTHOR_FIELDS = ["id", "works_count", "cited_by_count", "last_known_institutions"]
+
+
+def _short_id(openalex_id):
+    # 'https://openalex.org/A123' → 'A123' (URL más corta con 100 IDs)
+    return openalex_id.rsplit("/", 1)[-1]
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _author_row(author):
+    institutions = author.get("last_known_institutions") or []
+    last_known = next((inst.get("id") for inst in institutions if inst.get("id")), None)
+
+    return (
+        author["id"],
+        author.get("works_count") or 0,
+        author.get("cited_by_count") or 0,
+        last_known,
+    )
+
+
+def fetch_author_stats(author_ids):
+    """
+    Una sola petición a /authors para hasta MAX_OR_VALUES IDs
+    (filtro openalex:A1|A2|...). Devuelve (filas, ids_no_devueltos).
+    """
+    query = Authors().filter(openalex="|".join(_short_id(a) for a in author_ids)).select(AUTHOR_FIELDS)
+    # las estadísticas se piden justo porque cambian: sin cache
+    page, _ = get_page(query, per_page=len(author_ids), use_cache=False)
+
+    rows = {}
+    for author in page:
+        if author.get("id"):
+            rows[author["id"]] = _author_row(author)
+
+    missing = [a for a in author_ids if a not in rows]
+    return list(rows.values()), missing
+
+
+def enrich_authors(limit=None, batch_size=MAX_OR_VALUES, max_workers=None, stale_days=None):
+    """
+    Completa works_count, cited_by_count y last_known_institution_id de los
+    autores que normalize_work insertó sin estadísticas.
+    - los IDs pendientes se piden en batches de `batch_size` (máx. MAX_OR_VALUES)
+    - `max_workers` peticiones concurrentes (settings.AUTHOR_ENRICH_WORKERS)
+    - cada batch recibido se escribe con un UPDATE en bulk
+    - stale_days: también re-enriquece los autores actualizados hace más de
+      ese número de días (settings.AUTHOR_ENRICH_STALE_DAYS)
+    Un batch que falla se reporta y queda pendiente para la próxima corrida.
+    """
+    batch_size = max(1, min(batch_size, MAX_OR_VALUES))
+    max_workers = max_workers or settings.AUTHOR_ENRICH_WORKERS
+    if stale_days is None:
+        stale_days = settings.AUTHOR_ENRICH_STALE_DAYS
+
+    print("=" * 60)
+    print("🚀 Enriqueciendo autores desde OpenAlex")
+    print("=" * 60)
+
+    start_time = time.perf_counter()
+
+    author_ids = fetch_authors_needing_enrichment(limit=limit, stale_days=stale_days)
+    if not author_ids:
+        print("✅ No hay autores pendientes de enriquecer")
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "missing": 0, "failed": 0}
+
+    batches = list(_chunks(author_ids, batch_size))
+    print(f"👥 {len(author_ids)} autores en {len(batches)} batches ({max_workers} peticiones concurrentes)")
+
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "missing": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_author_stats, batch): batch for batch in batches}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            batch = futures[future]
+            try:
+                rows, missing = future.result()
+            except Exception as e:
+                totals["failed"] += len(batch)
+                print(f"   ❌ Batch {done}/{len(batches)}: {e}")
+                continue
+
+            stats = bulk_update_author_stats(rows, missing_ids=missing)
+            for key in ("inserted", "updated", "unchanged"):
+                totals[key] += stats[key]
+            totals["missing"] += len(missing)
+
+            print(f"   📊 Batch {done}/{len(batches)}: {format_upsert_stats(stats)}"
+                  + (f", {len(missing)} no encontrados" if missing else ""))
+
+    total_time = time.perf_counter() - start_time
+
+    print("=" * 60)
+    print(f"✅ Autores: {totals['updated']} actualizados, {totals['unchanged']} sin cambios, "
+          f"{totals['missing']} no encontrados en OpenAlex")
+    if totals["failed"]:
+        print(f"⚠️ {totals['failed']} autores quedaron pendientes por errores (se reintentan en la próxima corrida)")
+    print(f"⏱️ Duración: {total_time:.2f} segundos")
+    print("=" * 60)
+
+    return totals
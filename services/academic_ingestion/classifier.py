@@ -0,0 +1,153 @@
+import json
+import re
+from pathlib import Path
+
+
+# -------------------------
+# Palabras clave CTI (Ciencia, Tecnología e Innovación)
+# -------------------------
+CTI_KEYWORDS = [
+    # Ciencia
+    'physics', 'chemistry', 'biology', 'mathematics', 'biochemistry',
+    'molecular biology', 'genetics', 'neuroscience', 'medicine',
+
+    # Tecnología
+    'computer science', 'artificial intelligence', 'machine learning',
+    'data science', 'deep learning', 'robotics', 'computer vision',
+    'blockchain', 'cloud computing', 'big data', 'software engineering',
+    'materials science', 'nanotechnology', 'biotechnology',
+    'engineering', 'bioengineering', 'software', 'development', 'cybersecurity',
+    'web', 'web development', 'app', 'iot', 'website', 'web site', 'application',
+
+    # Innovación
+    'innovation', 'research and development', 'technology transfer',
+    'intellectual property', 'entrepreneurship', 'startup',
+    'business model', 'technology management', 'innovation management',
+    'knowledge management', 'disruptive technology',
+
+    # Términos relacionados
+    'computational', 'digital', 'automated', 'advanced', 'novel',
+    'development', 'application', 'system'
+]
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """Forma canónica de un display_name: minúsculas y espacios colapsados."""
+    return _WHITESPACE_RE.sub(" ", name).strip().lower()
+
+
+def short_concept_id(concept_id):
+    """'https://openalex.org/C41008148' → 'C41008148'."""
+    return concept_id.rsplit("/", 1)[-1]
+
+
+def load_concepts_file(path):
+    """
+    Lee registros de conceptos de OpenAlex desde JSON o JSON-lines
+    (p. ej. concepts_output.json: una lista de conceptos por línea).
+    Devuelve una lista plana de dicts.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+
+    try:
+        docs = [json.loads(text)]
+    except json.JSONDecodeError:
+        docs = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    concepts = []
+    for doc in docs:
+        items = doc if isinstance(doc, list) else [doc]
+        for item in items:
+            if isinstance(item, list):
+                concepts.extend(c for c in item if isinstance(c, dict))
+            elif isinstance(item, dict):
+                concepts.append(item)
+    return concepts
+
+
+# -------------------------
+# Clasificador
+# -------------------------
+class ConceptClassifier:
+    """
+    Clasifica trabajos de OpenAlex por sus conceptos.
+
+    La lista de palabras clave se compila una vez en dos hash sets
+    (IDs de concepto y nombres normalizados) y el veredicto de cada concepto
+    visto se memoiza; clasificar un trabajo es una búsqueda O(1) por concepto.
+
+    - concept_ids: IDs aceptados además de los nombres (p. ej. los resueltos
+      para el filtro server-side)
+    - min_score: score mínimo del concepto en el trabajo (0 = cualquiera)
+    - hierarchy: registros de conceptos (ver load_concepts_file). Sirven para
+      (1) traducir nombres clave a IDs sin llamar a la API y (2) si traen
+      `ancestors`, aceptar también los descendientes de un concepto clave
+    """
+
+    def __init__(self, keywords=CTI_KEYWORDS, concept_ids=(), min_score=0.0, hierarchy=None):
+        self.names = frozenset(normalize_name(k) for k in keywords)
+        ids = {short_concept_id(c) for c in concept_ids}
+
+        if hierarchy:
+            ids |= self._expand(hierarchy, ids)
+
+        self.ids = frozenset(ids)
+        self.min_score = min_score
+        self._cache = {}
+
+    def _expand(self, hierarchy, ids):
+        expanded = set()
+
+        # nombres clave → IDs
+        for concept in hierarchy:
+            if concept.get("id") and normalize_name(concept.get("display_name") or "") in self.names:
+                expanded.add(short_concept_id(concept["id"]))
+
+        # descendientes: conceptos con algún ancestro ya aceptado
+        roots = ids | expanded
+        for concept in hierarchy:
+            ancestors = concept.get("ancestors") or []
+            if concept.get("id") and any(
+                a.get("id") and short_concept_id(a["id"]) in roots for a in ancestors
+            ):
+                expanded.add(short_concept_id(concept["id"]))
+
+        return expanded
+
+    def _verdict(self, concept_id, name):
+        if concept_id and short_concept_id(concept_id) in self.ids:
+            return True
+        return bool(name) and normalize_name(name) in self.names
+
+    def matches(self, work):
+        concepts = work.get("concepts")
+        if not isinstance(concepts, list):
+            return False
+
+        # OpenAlex tiene ~65k conceptos: el veredicto se memoiza por (id, nombre)
+        cache = self._cache
+        min_score = self.min_score
+        for c in concepts:
+            if not isinstance(c, dict):
+                continue
+            if min_score and (c.get("score") or 0) < min_score:
+                continue
+            key = (c.get("id"), c.get("display_name"))
+            verdict = cache.get(key)
+            if verdict is None:
+                verdict = cache[key] = self._verdict(*key)
+            if verdict:
+                return True
+        return False
+
+    def classify_page(self, works):
+        """Una página completa en una llamada: lista de bool alineada con works."""
+        matches = self.matches
+        return [matches(w) for w in works]
+
+    def filter_page(self, works):
+        matches = self.matches
+        return [w for w in works if matches(w)]
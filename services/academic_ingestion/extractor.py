@@ -1,57 +1,293 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
 import pyalex
-from pyalex import Works
+from pyalex import Concepts, Works
 from core.config import settings
 from core.database import get_nuevo_leon_institution_ids
+from services.academic_ingestion.classifier import CTI_KEYWORDS, ConceptClassifier, load_concepts_file
+from services.academic_ingestion.openalex_client import get_page, iter_pages
+from services.academic_ingestion.transformer import WORK_FIELDS
 
 pyalex.config.api_key = settings.OPENALEX_API_KEY
 
-institution_ids = get_nuevo_leon_institution_ids()
+_institution_ids = None
 
-def fetch_works(year):
-    works = Works().filter_or(
-        institutions={"id": institution_ids},
-    ).filter(publication_year=year).paginate(per_page=200)
 
-    for page in works:
-        for work in page:
-            if is_cti(work):
-                yield work
+def get_institution_ids():
+    """
+    IDs de instituciones de Nuevo León desde la base (una consulta por proceso).
+    Se resuelven en el primer uso, no al importar el módulo.
+    """
+    global _institution_ids
 
-def is_cti(work):
+    if _institution_ids is None:
+        _institution_ids = get_nuevo_leon_institution_ids()
+    return _institution_ids
+
+# OpenAlex acepta hasta 100 valores por filtro OR
+MAX_OR_VALUES = 100
+
+CTI_FILTER_MODES = ("client", "server")
+
+_cti_concept_ids = None
+_cti_classifier = None
+
+
+def resolve_cti_concept_ids():
+    """
+    Traduce CTI_KEYWORDS a IDs de conceptos de OpenAlex (una vez por proceso).
+    Solo cuenta la coincidencia exacta de display_name, igual que is_cti.
+    """
+    global _cti_concept_ids
+
+    if _cti_concept_ids is None:
+        ids = []
+        for keyword in dict.fromkeys(CTI_KEYWORDS):
+            concepts, _ = get_page(Concepts().search_filter(display_name=keyword), per_page=25)
+            for concept in concepts:
+                if (concept.get("display_name") or "").lower() == keyword:
+                    ids.append(concept["id"].rsplit("/", 1)[-1])
+                    break
+
+        _cti_concept_ids = ids[:MAX_OR_VALUES]
+        print(f"🔎 {len(_cti_concept_ids)} conceptos CTI resueltos para el filtro server-side")
+
+    return _cti_concept_ids
+
+
+def _format_updated_since(updated_since):
+    # OpenAlex espera fecha u hora ISO en UTC
+    if isinstance(updated_since, datetime):
+        if updated_since.tzinfo is not None:
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        return updated_since.isoformat(timespec="seconds")
+    if isinstance(updated_since, date):
+        return updated_since.isoformat()
+    return str(updated_since)
+
+
+def _works_query(inst_ids, year, window=None, cti_filter=None, full_records=None, updated_since=None):
+    """
+    Arma la consulta de Works para un conjunto de instituciones.
+    year=None no filtra por año (sync incremental: todos los años).
+    updated_since agrega from_updated_date (solo trabajos modificados después).
+    cti_filter="server" agrega concepts.id:C1|C2|... para que OpenAlex descarte
+    los trabajos no CTI; si la resolución falla se queda en modo cliente.
+    full_records=False (por defecto, ver settings.OPENALEX_FULL_RECORDS) pide
+    solo WORK_FIELDS con select=.
+    """
+    query = Works().filter_or(institutions={"id": inst_ids})
+
+    if window is not None:
+        query = query.filter(from_publication_date=window[0], to_publication_date=window[1])
+    elif year is not None:
+        query = query.filter(publication_year=year)
+
+    if updated_since is not None:
+        query = query.filter(from_updated_date=_format_updated_since(updated_since))
+
+    if (cti_filter or settings.OPENALEX_CTI_FILTER) == "server":
+        try:
+            concept_ids = resolve_cti_concept_ids()
+        except Exception as e:
+            print(f"⚠️ No se pudieron resolver los conceptos CTI, filtrando en cliente: {e}")
+            concept_ids = []
+        if concept_ids:
+            query = query.filter(concepts={"id": "|".join(concept_ids)})
+
+    if full_records is None:
+        full_records = settings.OPENALEX_FULL_RECORDS
+    if not full_records:
+        query = query.select(WORK_FIELDS)
+
+    return query
+
+
+def fetch_works(year, cti_filter=None, full_records=None):
+    for works, _ in fetch_work_pages(year, cti_filter=cti_filter, full_records=full_records):
+        yield from works
+
+
+def fetch_work_pages(year, cursor="*", per_page=200, cti_filter=None, full_records=None, updated_since=None):
+    """
+    Recorre los trabajos del año con paginación por cursor de OpenAlex.
+    Entrega (trabajos_cti_de_la_página, next_cursor) por página.
+    - cursor: permite retomar desde un checkpoint
+    - next_cursor es None en la última página
+    - cti_filter: "client" (solo is_cti) o "server" (filtro de conceptos en
+      OpenAlex + is_cti como red de seguridad). Por defecto settings.OPENALEX_CTI_FILTER
+    - full_records: True desactiva la proyección select= (raw_source completo)
+    - updated_since: solo trabajos actualizados en OpenAlex desde esa fecha
+      (con year=None recorre todos los años)
+    """
+    query = _works_query(
+        get_institution_ids(), year, cti_filter=cti_filter, full_records=full_records, updated_since=updated_since
+    )
+
+    classifier = get_cti_classifier()
+    # un sync incremental tiene que ver lo que OpenAlex cambió: sin cache
+    for page, next_cursor in iter_pages(query, per_page=per_page, cursor=cursor, use_cache=updated_since is None):
+        yield classifier.filter_page(page), next_cursor
+
+
+# -------------------------
+# Harvest en shards
+# -------------------------
+# Chunks de instituciones más chicos que MAX_OR_VALUES mantienen la URL
+# corta y reparten el trabajo entre varios cursores.
+
+# Marcador de fin de un shard en la cola
+_SHARD_DONE = object()
 
-    conceptos_cyti = [
-        # Ciencia
-        'physics', 'chemistry', 'biology', 'mathematics', 'biochemistry', 
-        'molecular biology', 'genetics', 'neuroscience', 'medicine',
-        
-        # Tecnología
-        'computer science', 'artificial intelligence', 'machine learning',
-        'data science', 'deep learning', 'robotics', 'computer vision',
-        'blockchain', 'cloud computing', 'big data', 'software engineering',
-        'materials science', 'nanotechnology', 'biotechnology',
-        'engineering', 'bioengineering', 'software', 'development', 'cybersecurity', 
-        'web', 'web development', 'app', 'iot', 'website', 'web site', 'application'
-        
-        # Innovación
-        'innovation', 'research and development', 'technology transfer',
-        'intellectual property', 'entrepreneurship', 'startup',
-        'business model', 'technology management', 'innovation management',
-        'knowledge management', 'disruptive technology',
-        
-        # Términos relacionados
-        'computational', 'digital', 'automated', 'advanced', 'novel',
-        'development', 'application', 'system'
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _date_windows(year, windows):
+    """
+    Parte el año en `windows` ventanas contiguas de meses completos.
+    Devuelve [(from_date, to_date), ...] en formato ISO.
+    """
+    windows = max(1, min(windows, 12))
+    bounds = [round(i * 12 / windows) for i in range(windows + 1)]
+
+    result = []
+    for start_m, end_m in zip(bounds, bounds[1:]):
+        start = date(year, start_m + 1, 1)
+        end = date(year + 1, 1, 1) if end_m == 12 else date(year, end_m + 1, 1)
+        result.append((start.isoformat(), (end - timedelta(days=1)).isoformat()))
+    return result
+
+
+def _harvest_shard(year, inst_chunk, window, per_page, pages, stop, cti_filter=None, full_records=None,
+                   updated_since=None):
+    """Recorre un shard con su propio cursor y deja cada página en la cola."""
+    query = _works_query(
+        inst_chunk, year, window=window, cti_filter=cti_filter, full_records=full_records,
+        updated_since=updated_since,
+    )
+
+    classifier = get_cti_classifier()
+
+    try:
+        for page, _ in iter_pages(query, per_page=per_page, use_cache=updated_since is None):
+            if stop.is_set():
+                break
+            _put(pages, classifier.filter_page(page), stop)
+    except Exception as e:
+        _put(pages, e, stop)
+    finally:
+        _put(pages, _SHARD_DONE, stop)
+
+
+def _put(pages, item, stop):
+    # put con timeout para no quedar bloqueado si el consumidor ya se fue
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+def fetch_work_pages_sharded(year, institution_chunk=None, date_windows=None, max_workers=None, per_page=200,
+                             cti_filter=None, full_records=None, updated_since=None):
+    """
+    Variante paralela de fetch_work_pages:
+    - parte las instituciones en chunks de `institution_chunk` (filtro OR corto)
+    - opcionalmente parte el año en `date_windows` ventanas de fechas
+    - cada shard (chunk × ventana) corre con su propio cursor en un pool de
+      `max_workers` hilos; las páginas llegan por una cola acotada
+    - un trabajo con instituciones en varios chunks se entrega una sola vez
+    - cti_filter / full_records / updated_since: ver fetch_work_pages
+      (las ventanas de fechas solo aplican con year)
+
+    Entrega (trabajos_cti_de_la_página, "*") por página y ([], None) al final,
+    con la misma forma que fetch_work_pages. No hay cursor único que guardar:
+    "*" solo marca "quedan páginas"; el run sharded no se retoma.
+    """
+    institution_chunk = min(institution_chunk or settings.OPENALEX_INSTITUTION_CHUNK, MAX_OR_VALUES)
+    date_windows = date_windows or settings.OPENALEX_DATE_WINDOWS
+    max_workers = max_workers or settings.OPENALEX_SHARD_WORKERS
+
+    windows = _date_windows(year, date_windows) if year is not None and date_windows > 1 else [None]
+    shards = [
+        (chunk, window)
+        for chunk in _chunks(list(get_institution_ids()), institution_chunk)
+        for window in windows
     ]
 
-    concepts = []
-    if isinstance(work.get("concepts"), list):
-        concepts = [
-            c.get("display_name").lower()
-            for c in work["concepts"]
-            if isinstance(c, dict) and c.get("display_name")
-        ]
-    
-    if any(keyword in concepts for keyword in conceptos_cyti):
-        return True
-
-    return False
+    print(f"🧩 Harvest en {len(shards)} shards ({max_workers} hilos)")
+
+    # resolver los conceptos antes de lanzar los hilos (una sola vez)
+    if (cti_filter or settings.OPENALEX_CTI_FILTER) == "server":
+        try:
+            resolve_cti_concept_ids()
+        except Exception as e:
+            print(f"⚠️ No se pudieron resolver los conceptos CTI, filtrando en cliente: {e}")
+            cti_filter = "client"
+
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+    seen = set()
+    pending = len(shards)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for chunk, window in shards:
+            executor.submit(
+                _harvest_shard, year, chunk, window, per_page, pages, stop, cti_filter, full_records, updated_since
+            )
+
+        while pending:
+            item = pages.get()
+            if item is _SHARD_DONE:
+                pending -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+
+            works = []
+            for work in item:
+                if work["id"] not in seen:
+                    seen.add(work["id"])
+                    works.append(work)
+            if works:
+                yield works, "*"
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    yield [], None
+
+def get_cti_classifier():
+    """
+    Clasificador CTI compilado una vez por proceso (ver classifier.py).
+    Usa settings.CTI_MIN_SCORE y, si está configurado, settings.CTI_CONCEPTS_FILE
+    como jerarquía de conceptos.
+    """
+    global _cti_classifier
+
+    if _cti_classifier is None:
+        hierarchy = None
+        if settings.CTI_CONCEPTS_FILE:
+            try:
+                hierarchy = load_concepts_file(settings.CTI_CONCEPTS_FILE)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ No se pudo leer {settings.CTI_CONCEPTS_FILE}, clasificando solo por nombre: {e}")
+
+        _cti_classifier = ConceptClassifier(
+            CTI_KEYWORDS,
+            min_score=settings.CTI_MIN_SCORE,
+            hierarchy=hierarchy,
+        )
+    return _cti_classifier
+
+
+def is_cti(work):
+    return get_cti_classifier().matches(work)
@@ -1,188 +1,267 @@
-from core.database import _flush_batch
-from services.academic_ingestion.extractor import fetch_works
-from services.academic_ingestion.transformer import normalize_work
-from core.database import get_connection
+import multiprocessing
+import queue
+import threading
 import time
-from psycopg2.extras import execute_values
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from core.config import settings
+from core.database import (
+    FLUSH_LOADERS,
+    RAW_STORE_MODES,
+    finish_ingest_run,
+    format_upsert_stats,
+    get_last_sync_time,
+    save_ingest_checkpoint,
+    start_ingest_run,
+)
+from services.academic_ingestion.extractor import (
+    CTI_FILTER_MODES,
+    fetch_work_pages,
+    fetch_work_pages_sharded,
+    get_institution_ids,
+)
+from services.academic_ingestion.transformer import prepare_batch
+from core.pool import get_pool
 
 BATCH_SIZE = 500
 
-def get_existing_entities(cur, inst_ids=None, author_ids=None):
-    """Return sets of existing institution and author IDs"""
-    result = {
-        "institutions": set(),
-        "authors": set()
-    }
-    
-    # Check institutions
-    if inst_ids:
-        cur.execute("CREATE TEMP TABLE temp_inst_ids (id TEXT) ON COMMIT DROP")
-        execute_values(
-            cur,
-            "INSERT INTO temp_inst_ids (id) VALUES %s",
-            [(inst_id,) for inst_id in inst_ids]
-        )
-        
-        cur.execute("""
-            SELECT t.id 
-            FROM temp_inst_ids t
-            INNER JOIN institutions_catalog ic ON ic.openalex_id = t.id
-        """)
-        result["institutions"] = {row[0] for row in cur.fetchall()}
-    
-    # Check authors
-    if author_ids:
-        cur.execute("CREATE TEMP TABLE temp_author_ids (id TEXT) ON COMMIT DROP")
-        execute_values(
-            cur,
-            "INSERT INTO temp_author_ids (id) VALUES %s",
-            [(author_id,) for author_id in author_ids]
-        )
-        
-        cur.execute("""
-            SELECT t.id 
-            FROM temp_author_ids t
-            INNER JOIN authors a ON a.openalex_id = t.id
-        """)
-        result["authors"] = {row[0] for row in cur.fetchall()}
-    
-    return result
-
-def bulk_insert_works(year):
+
+# -------------------------
+# Pipeline: fetch → normalize → flush
+# -------------------------
+# Tres etapas que se solapan en vez de sumarse:
+#   1. hilo de fetch: páginas de OpenAlex agrupadas en batches
+#   2. pool de procesos: normalize_work + json.dumps (transformer.prepare_batch)
+#   3. writer (hilo principal, dueño de la conexión): flush + checkpoint + commit
+# La cola entre etapas está acotada a ACADEMIC_PIPELINE_DEPTH batches, así que
+# el fetch no se adelanta más que eso a la base.
+
+# Marcador de fin del fetch en la cola
+_FETCH_DONE = object()
+
+
+def _page_batches(pages, batch_size=BATCH_SIZE):
+    """
+    Agrupa páginas en batches de al menos batch_size trabajos.
+    Los batches se cortan en fronteras de página: así el cursor que acompaña
+    a cada batch marca exactamente hasta dónde quedó todo confirmado.
+    Entrega (trabajos, next_cursor); el último lleva next_cursor=None y puede
+    venir vacío (solo para guardar el checkpoint final).
+    """
+    current_batch = []
+    for works, next_cursor in pages:
+        current_batch.extend(works)
+
+        if len(current_batch) < batch_size and next_cursor is not None:
+            continue
+
+        yield current_batch, next_cursor
+        current_batch = []
+
+
+def _put(batches, item, stop):
+    # put con timeout para no quedar bloqueado si el writer ya se fue
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+def _fetch_stage(pages, batches, stop, normalize, existing_inst_ids, side_store):
+    """Etapa 1: lee OpenAlex y manda cada batch a normalizar sin esperar al writer."""
+    try:
+        for works, next_cursor in _page_batches(pages):
+            if stop.is_set():
+                break
+            _put(batches, (normalize(works, existing_inst_ids, side_store), len(works), next_cursor), stop)
+    except Exception as e:
+        _put(batches, e, stop)
+    finally:
+        pages.close()
+        _put(batches, _FETCH_DONE, stop)
+
+
+def _normalize_inline(works, existing_inst_ids, side_store):
+    # ACADEMIC_NORMALIZE_WORKERS=0: sin procesos, se normaliza en el hilo de fetch
+    future = Future()
+    future.set_result(prepare_batch(works, existing_inst_ids, side_store))
+    return future
+
+
+def _write_batch(cur, batch_number, documents_batch, metadata_batch, flush_batch, raw_store_mode=None):
+    """Etapa 3: escribe un batch ya normalizado. Devuelve los conteos del upsert por tabla."""
+    print(f"📦 Procesando batch #{batch_number} ({len(documents_batch)} documentos)...")
+
+    stats = flush_batch(cur, documents_batch, metadata_batch, raw_store_mode=raw_store_mode)
+    for table, table_stats in stats.items():
+        print(f"   📊 {table}: {format_upsert_stats(table_stats)}")
+    return stats
+
+
+def _add_stats(totals, stats):
+    for table, table_stats in stats.items():
+        acc = totals.setdefault(table, {"inserted": 0, "updated": 0, "unchanged": 0})
+        for key, value in table_stats.items():
+            acc[key] += value
+
+
+def bulk_insert_works(year, loader=None, raw_store_mode=None, resume=False, sharded=False, cti_filter=None,
+                      full_records=None, updated_since=None):
+    """
+    year=None + updated_since: run incremental sobre todos los años (ver sync_updated_works).
+    loader: "values" (execute_values) o "copy" (COPY FROM STDIN + staging).
+    Por defecto settings.ACADEMIC_LOADER.
+    raw_store_mode: "inline" o "side" (payload crudo comprimido en academic_raw_sources).
+    Por defecto settings.RAW_SOURCE_STORE.
+    resume: retoma el último run no completado del año desde su checkpoint
+    (cursor de OpenAlex + número de batch) en academic_ingest_runs. El run
+    guarda cti_filter y full_records; retomarlo con otros valores falla.
+    sharded: harvest paralelo por chunks de instituciones / ventanas de fechas
+    (extractor.fetch_work_pages_sharded). No tiene cursor único, así que no
+    admite resume y su run queda fuera de los --resume secuenciales.
+    cti_filter: "client" o "server" (ver extractor.fetch_work_pages).
+    Por defecto settings.OPENALEX_CTI_FILTER.
+    full_records: True pide los registros completos (sin select=), p. ej. para
+    guardar el raw_source íntegro. Por defecto settings.OPENALEX_FULL_RECORDS.
+    updated_since: solo trabajos actualizados en OpenAlex desde esa fecha (from_updated_date).
+
+    Fetch, normalización y escritura corren en paralelo (ver "Pipeline" arriba);
+    settings.ACADEMIC_NORMALIZE_WORKERS y ACADEMIC_PIPELINE_DEPTH los ajustan.
+
+    Devuelve un resumen: run_id, total_processed, batches, upserts (por tabla) y elapsed.
+    """
+    loader = loader or settings.ACADEMIC_LOADER
+    if loader not in FLUSH_LOADERS:
+        raise ValueError(f"Loader desconocido: '{loader}'. Opciones: {', '.join(FLUSH_LOADERS)}")
+    flush_batch = FLUSH_LOADERS[loader]
+
+    raw_store_mode = raw_store_mode or settings.RAW_SOURCE_STORE
+    if raw_store_mode not in RAW_STORE_MODES:
+        raise ValueError(f"raw_store_mode desconocido: '{raw_store_mode}'. Opciones: {', '.join(RAW_STORE_MODES)}")
+    side_store = raw_store_mode == "side"
+
+    cti_filter = cti_filter or settings.OPENALEX_CTI_FILTER
+    if cti_filter not in CTI_FILTER_MODES:
+        raise ValueError(f"cti_filter desconocido: '{cti_filter}'. Opciones: {', '.join(CTI_FILTER_MODES)}")
+
+    if full_records is None:
+        full_records = settings.OPENALEX_FULL_RECORDS
+    full_records = bool(full_records)
+
+    if sharded and resume:
+        raise ValueError("--resume solo aplica al harvest secuencial (un cursor de OpenAlex)")
+
+    if year is None and updated_since is None and not resume:
+        raise ValueError("Sin año hace falta updated_since (sync incremental)")
+
+    scope = f"el año {year}" if year is not None else "todos los años (incremental)"
+
     print("=" * 60)
-    print(f"🚀 Iniciando inserción en bulk por el año {year}")
+    print(f"🚀 Iniciando inserción en bulk por {scope} (loader={loader})")
     print("=" * 60)
 
     start_time = time.perf_counter()
-    total_processed = 0
-    batch_number = 0
 
-    conn = get_connection()
+    pool = get_pool()
+    conn = pool.getconn()
     cur = conn.cursor()
+    run = None
 
     try:
-        # Process in batches from the generator
-        current_batch = []
-        
-        for work in fetch_works(year):
-            current_batch.append(work)
-            
-            if len(current_batch) >= BATCH_SIZE:
-                batch_number += 1
-                print(f"📦 Procesando batch #{batch_number} ({len(current_batch)} documentos)...")
-                
-                # Step 1: Extract all institution IDs and author IDs from this batch
-                all_inst_ids = set()
-                all_author_ids = set()
-                
-                for w in current_batch:
-                    # Extract institution IDs
-                    for authorship in w.get("authorships", []):
-                        for inst in authorship.get("institutions", []):
-                            inst_id = inst.get("id")
-                            if inst_id:
-                                all_inst_ids.add(inst_id)
-                        
-                        # Extract author IDs
-                        author = authorship.get("author", {})
-                        author_id = author.get("id")
-                        if author_id:
-                            all_author_ids.add(author_id)
-                
-                # Step 2: Check which institutions AND authors exist in catalog (single function)
-                print(f"   🔍 Verificando {len(all_inst_ids)} instituciones y {len(all_author_ids)} autores en catálogo...")
-                
-                existing = get_existing_entities(
-                    cur, 
-                    inst_ids=all_inst_ids if all_inst_ids else None,
-                    author_ids=all_author_ids if all_author_ids else None
+        run = start_ingest_run(
+            cur, year, resume=resume, updated_since=updated_since, sharded=sharded,
+            cti_filter=cti_filter, full_records=full_records,
+        )
+        conn.commit()
+
+        # un run retomado conserva el filtro con el que se generó su cursor
+        updated_since = run["updated_since"]
+        if year is None and updated_since is None:
+            raise ValueError("El run incremental no tiene updated_since")
+        if updated_since is not None:
+            print(f"🕒 Trabajos actualizados en OpenAlex desde {updated_since}")
+
+        total_processed = run["total_processed"]
+        batch_number = run["batch_number"]
+
+        if run["resumed"]:
+            print(f"♻️ Retomando run #{run['id']} desde el batch #{batch_number} ({total_processed} documentos ya insertados)")
+
+        upsert_totals = {}
+
+        if sharded:
+            pages = fetch_work_pages_sharded(
+                year, cti_filter=cti_filter, full_records=full_records, updated_since=updated_since
+            )
+        else:
+            pages = fetch_work_pages(
+                year, cursor=run["cursor"], cti_filter=cti_filter, full_records=full_records,
+                updated_since=updated_since,
+            )
+
+        # normalize_work solo conserva instituciones del catálogo
+        existing_inst_ids = frozenset(get_institution_ids())
+        print(f"🏛️ {len(existing_inst_ids)} instituciones en catálogo")
+
+        workers = settings.ACADEMIC_NORMALIZE_WORKERS
+        batches = queue.Queue(maxsize=max(1, settings.ACADEMIC_PIPELINE_DEPTH))
+        stop = threading.Event()
+
+        # spawn: los hijos no heredan la conexión ni los hilos del proceso padre
+        normalizer = (
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            if workers > 0
+            else None
+        )
+        normalize = (
+            (lambda works, inst_ids, side: normalizer.submit(prepare_batch, works, inst_ids, side))
+            if normalizer is not None
+            else _normalize_inline
+        )
+
+        fetcher = threading.Thread(
+            target=_fetch_stage,
+            args=(pages, batches, stop, normalize, existing_inst_ids, side_store),
+            name="openalex-fetch",
+            daemon=True,
+        )
+        fetcher.start()
+
+        try:
+            while True:
+                item = batches.get()
+                if item is _FETCH_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                future, batch_size, next_cursor = item
+                documents_batch, metadata_batch = future.result()
+
+                if batch_size:
+                    batch_number += 1
+                    stats = _write_batch(cur, batch_number, documents_batch, metadata_batch, flush_batch, raw_store_mode)
+                    _add_stats(upsert_totals, stats)
+                    total_processed += batch_size
+
+                # un run sharded no tiene cursor que retomar: solo se guardan los conteos
+                save_ingest_checkpoint(
+                    cur, run["id"], None if sharded else next_cursor, batch_number, total_processed
                 )
-                
-                existing_inst_ids = existing["institutions"]
-                existing_author_ids = existing["authors"]
-                
-                print(f"   ✅ {len(existing_inst_ids)} instituciones encontradas")
-                print(f"   ✅ {len(existing_author_ids)} autores encontrados")
-                
-                # Step 3: Process the batch with filtered institutions and author checking
-                documents_batch = []
-                metadata_batch = []
-                
-                for w in current_batch:
-                    # Pass both existing institution and author IDs to normalize_work
-                    normalized = normalize_work(
-                        w, 
-                        existing_inst_ids,
-                        existing_author_ids  # Now passing author IDs too
-                    )
-                    
-                    documents_batch.append((
-                        normalized["source_type"],
-                        normalized["canonical_identifier"],
-                        normalized["title"],
-                        normalized["raw_text"]
-                    ))
-                    
-                    metadata_batch.append(normalized)
-                    total_processed += 1
-                
-                # Step 4: Flush to database (now handles authors and pivots)
-                _flush_batch(cur, documents_batch, metadata_batch)
                 conn.commit()
-                print(f"   💾 Batch #{batch_number} insertado (incluyendo {len(all_author_ids)} autores)")
-                
-                # Clear the batch
-                current_batch = []
-        
-        # Process remaining works
-        if current_batch:
-            batch_number += 1
-            print(f"📦 Procesando último batch #{batch_number} ({len(current_batch)} documentos)...")
-            
-            # Same process for the final batch
-            all_inst_ids = set()
-            all_author_ids = set()
-            
-            for w in current_batch:
-                for authorship in w.get("authorships", []):
-                    for inst in authorship.get("institutions", []):
-                        inst_id = inst.get("id")
-                        if inst_id:
-                            all_inst_ids.add(inst_id)
-                    
-                    author = authorship.get("author", {})
-                    author_id = author.get("id")
-                    if author_id:
-                        all_author_ids.add(author_id)
-            
-            existing = get_existing_entities(
-                cur,
-                inst_ids=all_inst_ids if all_inst_ids else None,
-                author_ids=all_author_ids if all_author_ids else None
-            )
-            
-            existing_inst_ids = existing["institutions"]
-            existing_author_ids = existing["authors"]
-            
-            documents_batch = []
-            metadata_batch = []
-            
-            for w in current_batch:
-                normalized = normalize_work(w, existing_inst_ids, existing_author_ids)
-                
-                documents_batch.append((
-                    normalized["source_type"],
-                    normalized["canonical_identifier"],
-                    normalized["title"],
-                    normalized["raw_text"]
-                ))
-                
-                metadata_batch.append(normalized)
-                total_processed += 1
-            
-            _flush_batch(cur, documents_batch, metadata_batch)
-            conn.commit()
-            print(f"   💾 Batch #{batch_number} insertado (incluyendo {len(all_author_ids)} autores)")
+
+                if batch_size:
+                    print(f"   💾 Batch #{batch_number} insertado (checkpoint guardado)")
+        finally:
+            stop.set()
+            fetcher.join()
+            if normalizer is not None:
+                normalizer.shutdown(wait=True, cancel_futures=True)
+
+        finish_ingest_run(cur, run["id"], "completed")
+        conn.commit()
 
         end_time = time.perf_counter()
         total_time = end_time - start_time
@@ -191,16 +270,137 @@ def bulk_insert_works(year):
         print("✅ Ingestión académica completada exitosamente.")
         print(f"📄 Total de documentos procesados: {total_processed}")
         print(f"📦 Total de batches: {batch_number}")
+        for table, table_stats in upsert_totals.items():
+            print(f"📊 {table}: {table_stats['inserted']} insertados, {table_stats['updated']} actualizados, {table_stats['unchanged']} sin cambios")
         print(f"⏱️ Duración: {total_time:.2f} segundos")
         print("=" * 60)
 
+        return {
+            "run_id": run["id"],
+            "total_processed": total_processed,
+            "batches": batch_number,
+            "upserts": upsert_totals,
+            "elapsed": total_time,
+        }
+
     except Exception as e:
         conn.rollback()
-        print("❌ Error durante la ingestión. Reversando transacción.")
+        print("❌ Error durante la ingestión. Reversando el batch en curso.")
         print(f"Error: {str(e)}")
+        if run is not None:
+            finish_ingest_run(cur, run["id"], "failed", error=str(e))
+            conn.commit()
+            if sharded:
+                print(f"   ↩️ El run sharded #{run['id']} no se puede retomar: vuelve a lanzarlo completo")
+            else:
+                print(f"   ↩️ Usa --resume para continuar el run #{run['id']} desde el último checkpoint")
         import traceback
         traceback.print_exc()
         raise e
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        pool.putconn(conn)
+
+
+def sync_updated_works(since=None, **kwargs):
+    """
+    Sync incremental: trabajos de cualquier año actualizados en OpenAlex
+    desde el último sync completado (o desde `since`, obligatorio la primera vez).
+    Usa el mismo camino de batches/checkpoints que bulk_insert_works;
+    kwargs se pasan tal cual (loader, raw_store_mode, resume, sharded, ...).
+    """
+    if since is None:
+        pool = get_pool()
+        with pool.cursor() as cur:
+            since = get_last_sync_time(cur)
+
+    if since is None and not kwargs.get("resume"):
+        raise ValueError("No hay un sync previo: indica la fecha inicial con --since YYYY-MM-DD")
+
+    return bulk_insert_works(None, updated_since=since, **kwargs)
+
+
+# -------------------------
+# Varios años en paralelo
+# -------------------------
+def _ingest_year(year, kwargs):
+    """
+    Corre en un proceso aparte (pool propio, conexiones propias).
+    Nunca lanza: un año que falla se reporta sin tumbar a los demás.
+    """
+    start = time.perf_counter()
+    try:
+        summary = bulk_insert_works(year, **kwargs)
+        return {"year": year, "ok": True, "error": None, **summary}
+    except Exception as e:
+        return {"year": year, "ok": False, "error": str(e), "elapsed": time.perf_counter() - start}
+
+
+def ingest_years(years, workers=None, **kwargs):
+    """
+    Ingesta varios años, cada uno en su propio proceso (hasta `workers` a la vez).
+    kwargs se pasan tal cual a bulk_insert_works (loader, raw_store_mode, resume, ...).
+    Cada año tiene su propio run en academic_ingest_runs: si uno falla, los
+    demás siguen y ese año se puede retomar con --resume.
+    Devuelve la lista de resultados por año (ordenada por año).
+    """
+    years = sorted(set(years))
+    workers = max(1, min(workers or settings.ACADEMIC_YEAR_WORKERS, len(years)))
+
+    print("=" * 60)
+    print(f"🗓️ Ingestando {len(years)} años ({years[0]}–{years[-1]}) con {workers} procesos")
+    print("=" * 60)
+
+    start_time = time.perf_counter()
+    results = []
+
+    # spawn: cada proceso abre su propio pool de conexiones
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(_ingest_year, year, kwargs): year for year in years}
+
+        for future in as_completed(futures):
+            year = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # el proceso murió (p. ej. BrokenProcessPool): se marca solo ese año
+                result = {"year": year, "ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": None}
+            results.append(result)
+
+            done = f"({len(results)}/{len(years)})"
+            if result["ok"]:
+                print(f"✅ {year}: {result['total_processed']} documentos en {result['elapsed']:.2f} s {done}")
+            else:
+                print(f"❌ {year}: {result['error']} {done}")
+
+    results.sort(key=lambda r: r["year"])
+    total_time = time.perf_counter() - start_time
+
+    upsert_totals = {}
+    for result in results:
+        if result["ok"]:
+            _add_stats(upsert_totals, result["upserts"])
+
+    ok = [r for r in results if r["ok"]]
+    failed = [r for r in results if not r["ok"]]
+    year_time = sum(r["elapsed"] for r in results if r["elapsed"])
+
+    print("=" * 60)
+    print("📊 RESUMEN POR AÑO")
+    print("=" * 60)
+    for r in results:
+        elapsed = f"{r['elapsed']:.2f} s" if r["elapsed"] is not None else "-"
+        if r["ok"]:
+            print(f"   {r['year']}: ✅ {r['total_processed']} documentos, {r['batches']} batches, {elapsed}")
+        else:
+            print(f"   {r['year']}: ❌ {elapsed} — {r['error']}")
+    print(f"📄 Total de documentos procesados: {sum(r['total_processed'] for r in ok)}")
+    for table, table_stats in upsert_totals.items():
+        print(f"📊 {table}: {table_stats['inserted']} insertados, {table_stats['updated']} actualizados, {table_stats['unchanged']} sin cambios")
+    print(f"⏱️ Duración: {total_time:.2f} segundos (suma por año: {year_time:.2f} s)")
+    if failed:
+        hint = "volver a lanzarlos sin --sharded para poder retomarlos" if kwargs.get("sharded") else "reintentar con --resume"
+        print(f"↩️ Años fallidos: {', '.join(str(r['year']) for r in failed)} ({hint})")
+    print("=" * 60)
+
+    return results
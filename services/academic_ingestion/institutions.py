@@ -1,6 +1,7 @@
 import pyalex
 from pyalex import Institutions
 from core.config import settings
+from services.academic_ingestion.openalex_client import iter_pages
 
 pyalex.config.api_key = settings.OPENALEX_API_KEY
 
@@ -18,15 +19,25 @@ NUEVO_LEON_CITIES = [
     "Iturbide", "Mier y Noriega"
 ]
 
-def fetch_nuevo_leon_institutions(limit=None):
+# Campos que lee el mapper de abajo
+INSTITUTION_FIELDS = ["id", "display_name", "geo", "type", "works_count"]
+
+
+def fetch_nuevo_leon_institutions(limit=None, full_records=None):
+    """
+    full_records: True descarga el registro completo (sin select=).
+    Por defecto settings.OPENALEX_FULL_RECORDS.
+    """
+    if full_records is None:
+        full_records = settings.OPENALEX_FULL_RECORDS
 
     count = 0
 
-    institutions = Institutions().filter(
-        country_code="MX"
-    ).paginate(per_page=200)
+    query = Institutions().filter(country_code="MX")
+    if not full_records:
+        query = query.select(INSTITUTION_FIELDS)
 
-    for page in institutions:
+    for page, _ in iter_pages(query, per_page=200):
         for inst in page:
 
             city = inst.get("geo", {}).get("city")
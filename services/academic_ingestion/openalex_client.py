@@ -0,0 +1,38 @@
+import json
+
+from core.http_cache import cache_key, get_http_cache
+
+
+def get_page(query, per_page=200, cursor=None, use_cache=True):
+    """
+    Una página de `query` (consulta de pyalex) como (resultados, meta).
+    La petición siempre la hace pyalex (reintentos, api_key); con
+    HTTP_CACHE_ENABLED la respuesta además se guarda en el cache en disco
+    (core/http_cache.py) y un hit no sale a la red.
+    use_cache=False para lo que tiene que venir fresco de OpenAlex
+    (sync con updated_since, estadísticas de autores).
+    """
+    cache = get_http_cache() if use_cache else None
+    if cache is None:
+        return query.get(per_page=per_page, cursor=cursor, return_meta=True)
+
+    key, normalized = cache_key(query.url, {"per-page": per_page, "cursor": cursor})
+    cached = cache.get(key)
+    if cached is not None:
+        data = json.loads(cached)
+        return data["results"], data["meta"]
+
+    page, meta = query.get(per_page=per_page, cursor=cursor, return_meta=True)
+    cache.set(key, normalized, json.dumps({"results": list(page), "meta": meta}).encode("utf-8"))
+    return page, meta
+
+
+def iter_pages(query, per_page=200, cursor="*", use_cache=True):
+    """
+    Paginación por cursor: entrega (resultados, next_cursor) por página;
+    next_cursor es None en la última.
+    """
+    while cursor:
+        page, meta = get_page(query, per_page=per_page, cursor=cursor, use_cache=use_cache)
+        cursor = meta.get("next_cursor") if page else None
+        yield page, cursor
@@ -1,3 +1,8 @@
+import json
+
+from core import raw_store
+
+
 def reconstruct_abstract(inv_index):
     if not inv_index:
         return None
@@ -22,6 +27,22 @@ def safe_get(data, *keys):
             return None
     return data
 
+# Campos raíz de Work que leen normalize_work, is_cti y el batch de ingest
+# (select= de OpenAlex solo admite campos de primer nivel)
+WORK_FIELDS = [
+    "id",
+    "doi",
+    "title",
+    "abstract_inverted_index",
+    "authorships",
+    "primary_location",
+    "open_access",
+    "concepts",
+    "cited_by_count",
+    "publication_year",
+]
+
+
 def normalize_work(work, existing_inst_ids, existing_author_ids=None):
     """
     Normalize work data including authors
@@ -40,10 +61,11 @@ def normalize_work(work, existing_inst_ids, existing_author_ids=None):
                 "openalex_id": author_id,
                 "display_name": author.get("display_name"),
                 "orcid": author.get("orcid"),
-                # You might get these from other parts of the API
-                "last_known_institution_id": None,  # Could be derived
-                "works_count": 0,  # Will update later
-                "cited_by_count": 0  # Will update later
+                # Las authorships no traen estas estadísticas: las completa
+                # enrich-authors (services/academic_ingestion/authors.py) en batch
+                "last_known_institution_id": None,
+                "works_count": 0,
+                "cited_by_count": 0
             }
             authors_list.append(author_data)
         
@@ -90,4 +112,62 @@ def normalize_work(work, existing_inst_ids, existing_author_ids=None):
         # New fields for authors
         "authors_list": authors_list,  # Deduplicated list of authors in this work
         "pivot_authors": pivot_authors  # Relationship data
-    }
\ No newline at end of file
+    }
+
+
+# -------------------------
+# Serialización para el writer
+# -------------------------
+# Columnas JSONB de academic_metadata. Se serializan junto con la
+# normalización (en el pool de procesos del pipeline de ingest) para que el
+# hilo que escribe en la base solo envíe filas ya listas.
+JSON_COLUMNS = ("authors", "institutions", "concepts")
+
+
+def serialize_work(normalized, side_store=False):
+    """
+    Agrega `<columna>_json` a un trabajo normalizado y quita los objetos
+    grandes que el writer ya no necesita (authorships, conceptos, payload).
+    - side_store=False: raw_source_json con el payload para academic_metadata
+    - side_store=True: raw_payload = (hash, JSON canónico) para academic_raw_sources
+    `institutions` se conserva: el pivot academic_metadata_institutions lo lee.
+    """
+    for column in JSON_COLUMNS:
+        normalized[f"{column}_json"] = json.dumps(normalized.get(column, []))
+    normalized.pop("authors", None)
+    normalized.pop("concepts", None)
+
+    raw_source = normalized.pop("raw_source", None)
+    if side_store:
+        normalized["raw_source_json"] = None
+        if raw_source:
+            data = raw_store.canonical_json(raw_source)
+            normalized["raw_payload"] = (raw_store.content_hash(data), data)
+    else:
+        normalized["raw_source_json"] = json.dumps(raw_source or {})
+
+    return normalized
+
+
+def prepare_batch(works, existing_inst_ids, side_store=False):
+    """
+    Normaliza y serializa un batch de trabajos.
+    Devuelve (documents_batch, metadata_batch) en la forma que esperan los
+    flush loaders de core/database.py. Función pura: corre en un proceso aparte.
+    """
+    documents_batch = []
+    metadata_batch = []
+
+    for w in works:
+        normalized = normalize_work(w, existing_inst_ids)
+
+        documents_batch.append((
+            normalized["source_type"],
+            normalized["canonical_identifier"],
+            normalized["title"],
+            normalized["raw_text"]
+        ))
+
+        metadata_batch.append(serialize_work(normalized, side_store=side_store))
+
+    return documents_batch, metadata_batch
@@ -3,6 +3,7 @@ import os
 import json
 from typing import List, Dict, Any, Optional
 import hashlib
+from itertools import islice
 from dotenv import load_dotenv
 import requests
 
@@ -78,6 +79,26 @@ class ChromaService:
         """Genera un ID único para ChromaDB"""
         return f"{prefix}_{hashlib.md5(identifier.encode()).hexdigest()[:16]}"
     
+    def _stream_batches(self, conn, cursor_name, query, batch_size, itersize):
+        """
+        Ejecuta `query` con un cursor del lado del servidor (named cursor)
+        y entrega las filas en batches de `batch_size` conforme llegan.
+        - itersize: filas por round trip (FETCH) a PostgreSQL
+        La memoria se mantiene constante sin importar el tamaño del corpus.
+        """
+        cur = conn.cursor(name=cursor_name)
+        cur.itersize = itersize
+        try:
+            cur.execute(query)
+            rows = iter(cur)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cur.close()
+
     def delete_collection(self, collection_name: str):
         """Elimina una colección específica"""
         try:
@@ -101,65 +122,89 @@ class ChromaService:
         self.authors_collection = self._get_or_create_collection(f"{self.collection_prefix}authors")
         self.institutions_collection = self._get_or_create_collection(f"{self.collection_prefix}institutions")
     
-    def index_works(self, conn, limit=None, batch_size=100):
+    def index_works(self, conn, limit=None, batch_size=100, itersize=2000):
         """
         Indexa trabajos académicos desde PostgreSQL a ChromaDB Cloud
+        Las filas se leen en streaming (ver _stream_batches)
         """
-        cur = conn.cursor()
+        limit_sql = f"LIMIT {int(limit)}" if limit else ""
 
-        # Query para obtener trabajos con toda su información
-        query = """
-        SELECT 
-            d.id as document_id,
-            d.canonical_identifier,
-            d.title,
-            d.raw_text,
-            am.doi,
-            am.journal_name,
-            am.publication_year,
-            am.citation_count,
-            am.is_open_access,
-            am.authors as authors_json,
-            am.concepts as concepts_json,
-            (
-                SELECT json_agg(json_build_object(
+        # Query para obtener trabajos con toda su información.
+        # Autores e instituciones se agregan una sola vez (GROUP BY) y se unen
+        # por document_id, en vez de dos subconsultas json_agg por trabajo.
+        query = f"""
+        WITH works AS (
+            SELECT 
+                d.id as document_id,
+                d.canonical_identifier,
+                d.title,
+                d.raw_text,
+                am.doi,
+                am.journal_name,
+                am.publication_year,
+                am.citation_count,
+                am.is_open_access,
+                am.authors as authors_json,
+                am.concepts as concepts_json
+            FROM documents d
+            JOIN academic_metadata am ON am.document_id = d.id
+            ORDER BY d.id
+            {limit_sql}
+        ),
+        work_authors AS (
+            SELECT
+                ama.academic_metadata_id as document_id,
+                json_agg(json_build_object(
                     'author_id', a.openalex_id,
                     'author_name', a.display_name,
                     'position', ama.author_position,
                     'affiliation', ama.raw_affiliation
-                ))
-                FROM academic_metadata_authors ama
-                JOIN authors a ON a.openalex_id = ama.author_openalex_id
-                WHERE ama.academic_metadata_id = am.document_id
-            ) as detailed_authors,
-            (
-                SELECT json_agg(json_build_object(
+                )) as detailed_authors
+            FROM academic_metadata_authors ama
+            JOIN authors a ON a.openalex_id = ama.author_openalex_id
+            WHERE ama.academic_metadata_id IN (SELECT document_id FROM works)
+            GROUP BY ama.academic_metadata_id
+        ),
+        work_institutions AS (
+            SELECT
+                ami.document_id,
+                json_agg(json_build_object(
                     'institution_id', i.openalex_id,
                     'institution_name', i.display_name,
                     'city', i.city
-                ))
-                FROM academic_metadata_institutions ami
-                JOIN institutions_catalog i ON i.openalex_id = ami.institution_openalex_id
-                WHERE ami.document_id = am.document_id
-            ) as detailed_institutions
-        FROM documents d
-        JOIN academic_metadata am ON am.document_id = d.id
-        ORDER BY d.id
+                )) as detailed_institutions
+            FROM academic_metadata_institutions ami
+            JOIN institutions_catalog i ON i.openalex_id = ami.institution_openalex_id
+            WHERE ami.document_id IN (SELECT document_id FROM works)
+            GROUP BY ami.document_id
+        )
+        SELECT
+            w.document_id,
+            w.canonical_identifier,
+            w.title,
+            w.raw_text,
+            w.doi,
+            w.journal_name,
+            w.publication_year,
+            w.citation_count,
+            w.is_open_access,
+            w.authors_json,
+            w.concepts_json,
+            wa.detailed_authors,
+            wi.detailed_institutions
+        FROM works w
+        LEFT JOIN work_authors wa ON wa.document_id = w.document_id
+        LEFT JOIN work_institutions wi ON wi.document_id = w.document_id
+        ORDER BY w.document_id
         """
 
-        if limit:
-            query += f" LIMIT {limit}"
-
-        cur.execute(query)
-        works = cur.fetchall()
+        print("\n📚 Indexando trabajos en Chroma Cloud (streaming)...")
 
-        print(f"\n📚 Indexando {len(works)} trabajos en Chroma Cloud...")
+        total_rows = 0
+        batches = self._stream_batches(conn, "index_works", query, batch_size, itersize)
 
-        total_batches = (len(works) + batch_size - 1) // batch_size
-
-        for i in range(0, len(works), batch_size):
-            batch = works[i:i+batch_size]
-            batch_num = i//batch_size + 1
+        for batch_num, batch in enumerate(batches, start=1):
+            total_rows += len(batch)
 
             ids = []
             documents = []
@@ -257,7 +302,7 @@ class ChromaService:
                     metadatas=metadatas
                 )
 
-                print(f"   ✅ Batch {batch_num}/{total_batches} completado ({len(batch)} trabajos)")
+                print(f"   ✅ Batch {batch_num} completado ({len(batch)} trabajos, {total_rows} leídos)")
             except Exception as e:
                 print(f"   ❌ Error en batch {batch_num}: {e}")
                 # Intentar de a uno para identificar el problema
@@ -275,17 +320,23 @@ class ChromaService:
                         print(f"      ⚠️ Error con documento {doc_id}: {e2}")
 
         final_count = self.works_collection.count()
-        print(f"\n✅ Indexación de trabajos completada. Total en colección: {final_count}")
+        print(f"\n✅ Indexación de trabajos completada ({total_rows} leídos). Total en colección: {final_count}")
         return final_count
     
-    def index_authors(self, conn, limit=None, batch_size=100):
+    def index_authors(self, conn, limit=None, batch_size=100, itersize=2000):
         """
         Indexa autores desde PostgreSQL a ChromaDB Cloud
+        Las filas se leen en streaming (ver _stream_batches)
         """
-        cur = conn.cursor()
-        
-        # Query para autores
+        # Query para autores (conteo de trabajos pre-agregado con GROUP BY)
         query = """
+            WITH author_works AS (
+                SELECT
+                    author_openalex_id,
+                    COUNT(DISTINCT academic_metadata_id) as actual_works_count
+                FROM academic_metadata_authors
+                GROUP BY author_openalex_id
+            )
             SELECT 
                 a.openalex_id,
                 a.display_name,
@@ -293,13 +344,10 @@ class ChromaService:
                 ic.display_name as institution_name,
                 a.works_count,
                 a.cited_by_count,
-                (
-                    SELECT COUNT(DISTINCT ama.academic_metadata_id)
-                    FROM academic_metadata_authors ama
-                    WHERE ama.author_openalex_id = a.openalex_id
-                ) as actual_works_count
+                COALESCE(aw.actual_works_count, 0) as actual_works_count
             FROM authors a
             LEFT JOIN institutions_catalog ic ON ic.openalex_id = a.last_known_institution_id
+            LEFT JOIN author_works aw ON aw.author_openalex_id = a.openalex_id
             WHERE a.display_name IS NOT NULL
             ORDER BY a.works_count DESC NULLS LAST
         """
@@ -307,16 +355,14 @@ class ChromaService:
         if limit:
             query += f" LIMIT {limit}"
         
-        cur.execute(query)
-        authors = cur.fetchall()
-        
-        print(f"\n👥 Indexando {len(authors)} autores en Chroma Cloud...")
+        print("\n👥 Indexando autores en Chroma Cloud (streaming)...")
         
-        total_batches = (len(authors) + batch_size - 1) // batch_size
+        total_rows = 0
+        batches = self._stream_batches(conn, "index_authors", query, batch_size, itersize)
         
-        for i in range(0, len(authors), batch_size):
-            batch = authors[i:i+batch_size]
-            batch_num = i//batch_size + 1
+        for batch_num, batch in enumerate(batches, start=1):
+            i = total_rows
+            total_rows += len(batch)
             
             ids = []
             documents = []
@@ -361,40 +407,48 @@ class ChromaService:
                     embeddings=embeddings,
                     metadatas=metadatas
                 )
-                print(f"   ✅ Batch {batch_num}/{total_batches} completado ({len(batch)} autores)")
+                print(f"   ✅ Batch {batch_num} completado ({len(batch)} autores, {total_rows} leídos)")
             except Exception as e:
                 print(f"   ❌ Error en batch {batch_num}: {e}")
         
         final_count = self.authors_collection.count()
-        print(f"\n✅ Indexación de autores completada. Total en colección: {final_count}")
+        print(f"\n✅ Indexación de autores completada ({total_rows} leídos). Total en colección: {final_count}")
         return final_count
     
-    def index_institutions(self, conn, limit=None, batch_size=100):
+    def index_institutions(self, conn, limit=None, batch_size=100, itersize=2000):
         """
         Indexa instituciones desde PostgreSQL a ChromaDB Cloud
         Adaptado para tu estructura actual de institutions_catalog
+        Las filas se leen en streaming (ver _stream_batches)
         """
-        cur = conn.cursor()
-        
-        # Query adaptada a tu estructura exacta
+        # Query adaptada a tu estructura exacta (conteos pre-agregados con GROUP BY)
         query = """
+            WITH institution_documents AS (
+                SELECT
+                    institution_openalex_id,
+                    COUNT(DISTINCT document_id) as documents_count
+                FROM academic_metadata_institutions
+                GROUP BY institution_openalex_id
+            ),
+            institution_authors AS (
+                SELECT
+                    last_known_institution_id,
+                    COUNT(DISTINCT openalex_id) as associated_authors
+                FROM authors
+                WHERE last_known_institution_id IS NOT NULL
+                GROUP BY last_known_institution_id
+            )
             SELECT 
                 i.openalex_id,
                 i.display_name,
                 i.city,
                 i.type,
                 i.works_count,
-                (
-                    SELECT COUNT(DISTINCT ami.document_id)
-                    FROM academic_metadata_institutions ami
-                    WHERE ami.institution_openalex_id = i.openalex_id
-                ) as documents_count,
-                (
-                    SELECT COUNT(DISTINCT a.openalex_id)
-                    FROM authors a
-                    WHERE a.last_known_institution_id = i.openalex_id
-                ) as associated_authors
+                COALESCE(idoc.documents_count, 0) as documents_count,
+                COALESCE(ia.associated_authors, 0) as associated_authors
             FROM institutions_catalog i
+            LEFT JOIN institution_documents idoc ON idoc.institution_openalex_id = i.openalex_id
+            LEFT JOIN institution_authors ia ON ia.last_known_institution_id = i.openalex_id
             WHERE i.display_name IS NOT NULL
             ORDER BY i.works_count DESC NULLS LAST
         """
@@ -402,16 +456,14 @@ class ChromaService:
         if limit:
             query += f" LIMIT {limit}"
         
-        cur.execute(query)
-        institutions = cur.fetchall()
-        
-        print(f"\n🏛️ Indexando {len(institutions)} instituciones en Chroma Cloud...")
+        print("\n🏛️ Indexando instituciones en Chroma Cloud (streaming)...")
         
-        total_batches = (len(institutions) + batch_size - 1) // batch_size
+        total_rows = 0
+        batches = self._stream_batches(conn, "index_institutions", query, batch_size, itersize)
         
-        for i in range(0, len(institutions), batch_size):
-            batch = institutions[i:i+batch_size]
-            batch_num = i//batch_size + 1
+        for batch_num, batch in enumerate(batches, start=1):
+            i = total_rows
+            total_rows += len(batch)
             
             ids = []
             documents = []
@@ -464,12 +516,12 @@ class ChromaService:
                     metadatas=metadatas,
                     embeddings=embeddings
                 )
-                print(f"   ✅ Batch {batch_num}/{total_batches} completado ({len(batch)} instituciones)")
+                print(f"   ✅ Batch {batch_num} completado ({len(batch)} instituciones, {total_rows} leídos)")
             except Exception as e:
                 print(f"   ❌ Error en batch {batch_num}: {e}")
         
         final_count = self.institutions_collection.count()
-        print(f"\n✅ Indexación de instituciones completada. Total en colección: {final_count}")
+        print(f"\n✅ Indexación de instituciones completada ({total_rows} leídos). Total en colección: {final_count}")
         return final_count
     
     # Métodos de búsqueda
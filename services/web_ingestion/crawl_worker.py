@@ -1,44 +1,123 @@
 import asyncio
-from core.database import fetch_pending_web_documents, update_document_raw_text_by_id
+import sys
+from core.async_database import (
+    AsyncListener,
+    close_async_pool,
+    fetch_pending_web_documents_async,
+    mark_crawl_failed_many_async,
+    update_raw_text_many_async,
+)
+from core.notify import CHANNEL_WEB_DISCOVERED
 
 from crawl4ai import AsyncWebCrawler
 
 
-async def process_batch(batch_size: int = 5, delay_s: float = 0.5):
-    pending = fetch_pending_web_documents(limit=batch_size)
+async def crawl_one(crawler, item, sem: asyncio.Semaphore, results: asyncio.Queue, delay_s: float):
+    doc_id = item["id"]
+    url = item["url"]
+
+    async with sem:
+        try:
+            result = await crawler.arun(url=url)
+
+            # Crawl4AI 0.8.0 normalmente expone markdown
+            markdown = getattr(result, "markdown", None)
+
+            # fallback por si cambia el atributo
+            if not markdown:
+                markdown = getattr(result, "markdown_v2", None)
+
+            if not markdown:
+                await results.put((doc_id, None, "sin markdown"))
+                print(f"[crawl_worker] ❌ Sin markdown doc_id={doc_id} url={url}")
+            else:
+                await results.put((doc_id, markdown, None))
+                print(f"[crawl_worker] ✅ Crawleado doc_id={doc_id} chars={len(markdown)} url={url}")
+
+        except Exception as e:
+            await results.put((doc_id, None, e))
+            print(f"[crawl_worker] ❌ Error doc_id={doc_id} url={url} err={e}")
+
+        await asyncio.sleep(delay_s)
+
+
+async def persist_results(results: asyncio.Queue, flush_every: int) -> int:
+    """
+    Consume resultados del crawler y los guarda en micro-batches
+    mientras los demás fetches siguen en vuelo. None = fin.
+    Los fallos se registran (intentos + backoff) para no re-tomarlos en el siguiente batch.
+    """
+    saved = 0
+    buffer = []
+    failed = []
+
+    while True:
+        item = await results.get()
+        if item is not None:
+            doc_id, markdown, error = item
+            if error is None:
+                buffer.append((doc_id, markdown))
+            else:
+                failed.append((doc_id, error))
+
+        if buffer and (item is None or len(buffer) >= flush_every):
+            saved += await update_raw_text_many_async(buffer)
+            buffer = []
+
+        if failed and (item is None or len(failed) >= flush_every):
+            await mark_crawl_failed_many_async(failed)
+            failed = []
+
+        if item is None:
+            return saved
+
+
+async def process_batch(batch_size: int = 5, delay_s: float = 0.5, concurrency: int = 4, flush_every: int = 10):
+    pending = await fetch_pending_web_documents_async(limit=batch_size)
     if not pending:
         print("[crawl_worker] No hay documentos pendientes (raw_text IS NULL).")
-        return
-
-    print(f"[crawl_worker] Procesando batch de {len(pending)} URLs...")
+        return 0
 
-    async with AsyncWebCrawler(verbose=True) as crawler:
-        for item in pending:
-            doc_id = item["id"]
-            url = item["url"]
+    print(f"[crawl_worker] Procesando batch de {len(pending)} URLs (concurrency={concurrency})...")
 
-            try:
-                result = await crawler.arun(url=url)
+    results: asyncio.Queue = asyncio.Queue()
+    writer = asyncio.create_task(persist_results(results, flush_every))
+    sem = asyncio.Semaphore(concurrency)
 
-                # Crawl4AI 0.8.0 normalmente expone markdown
-                markdown = getattr(result, "markdown", None)
+    try:
+        async with AsyncWebCrawler(verbose=True) as crawler:
+            await asyncio.gather(*(crawl_one(crawler, item, sem, results, delay_s) for item in pending))
+    finally:
+        # guardar lo ya crawleado aunque el crawler falle
+        await results.put(None)
+        saved = await writer
 
-                # fallback por si cambia el atributo
-                if not markdown:
-                    markdown = getattr(result, "markdown_v2", None)
+    print(f"[crawl_worker] 💾 Guardados {saved}/{len(pending)} documentos")
+    return len(pending)
 
-                if not markdown:
-                    print(f"[crawl_worker] ❌ Sin markdown doc_id={doc_id} url={url}")
-                    continue
 
-                update_document_raw_text_by_id(doc_id, markdown)
-                print(f"[crawl_worker] ✅ Guardado doc_id={doc_id} chars={len(markdown)} url={url}")
+async def run_forever(batch_size: int = 5, delay_s: float = 0.5, concurrency: int = 4, idle_timeout_s: float = 300):
+    """
+    Procesa batches mientras haya pendientes; con la cola vacía bloquea
+    en LISTEN web_discovered (idle_timeout_s es solo una red de seguridad).
+    """
+    async with AsyncListener(CHANNEL_WEB_DISCOVERED) as listener:
+        while True:
+            processed = await process_batch(batch_size=batch_size, delay_s=delay_s, concurrency=concurrency)
+            if not processed:
+                print(f"[crawl_worker] 💤 Esperando NOTIFY {CHANNEL_WEB_DISCOVERED}...")
+                await listener.wait(timeout_s=idle_timeout_s)
 
-            except Exception as e:
-                print(f"[crawl_worker] ❌ Error doc_id={doc_id} url={url} err={e}")
 
-            await asyncio.sleep(delay_s)
+async def main(listen: bool = False):
+    try:
+        if listen:
+            await run_forever(batch_size=5, delay_s=0.5)
+        else:
+            await process_batch(batch_size=5, delay_s=0.5)
+    finally:
+        await close_async_pool()
 
 
 if __name__ == "__main__":
-    asyncio.run(process_batch(batch_size=5, delay_s=0.5))
\ No newline at end of file
+    asyncio.run(main(listen="--listen" in sys.argv[1:]))
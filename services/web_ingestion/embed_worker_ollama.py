@@ -1,13 +1,15 @@
 import os
 import re
+import sys
 import time
-from typing import List, Dict, Any
+from typing import List
 
-import psycopg2
 import requests
 import chromadb
 
 from core.config import settings
+from core.database import fetch_pending_web_metadata_for_embedding, mark_embed_failed_many, mark_embedded_many
+from core.notify import CHANNEL_WEB_NORMALIZED, Listener
 
 
 # -------------------------
@@ -25,68 +27,6 @@ CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 
 
-# -------------------------
-# Supabase connection
-# -------------------------
-def get_connection():
-    return psycopg2.connect(
-        host=settings.SUPABASE_HOST,
-        database=settings.SUPABASE_DB,
-        user=settings.SUPABASE_USER,
-        password=settings.SUPABASE_PASSWORD,
-        port=int(settings.SUPABASE_PORT or 5432),
-        sslmode="require",
-    )
-
-
-def fetch_pending_web_metadata_for_embedding(limit: int = 10) -> List[Dict[str, Any]]:
-    """
-    Trae filas con cleaned_text y embedded_at NULL
-    """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-          wm.document_id,
-          wm.url,
-          COALESCE(d.title, '') as title,
-          COALESCE(wm.data->>'cleaned_text', '') as cleaned_text
-        FROM web_metadata wm
-        LEFT JOIN documents d ON d.id = wm.document_id
-        WHERE COALESCE(wm.data->>'cleaned_text', '') <> ''
-          AND wm.embedded_at IS NULL
-        ORDER BY wm.created_at DESC
-        LIMIT %s
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    return [
-        {"document_id": r[0], "url": r[1], "title": r[2], "cleaned_text": r[3]}
-        for r in rows
-    ]
-
-
-def mark_embedded(document_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        UPDATE web_metadata
-        SET embedded_at = NOW()
-        WHERE document_id = %s
-        """,
-        (document_id,),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-
-
 # -------------------------
 # Chroma
 # -------------------------
@@ -184,16 +124,18 @@ def ollama_embed(texts: List[str]) -> List[List[float]]:
 # -------------------------
 # Worker
 # -------------------------
-def run(limit_docs: int = 10, sleep_s: float = 0.1):
-    col = get_chroma_collection()
-
+def process_batch(col, limit_docs: int = 10, sleep_s: float = 0.1) -> int:
     pending = fetch_pending_web_metadata_for_embedding(limit=limit_docs)
     if not pending:
         print("[embed_ollama] No hay pendientes (embedded_at IS NULL).")
-        return
+        return 0
 
     print(f"[embed_ollama] Procesando {len(pending)} docs | ollama={OLLAMA_URL} model={OLLAMA_EMBED_MODEL} | collection={CHROMA_COLLECTION}")
 
+    # Se marcan todos juntos al final (un UPDATE/commit por batch)
+    embedded_ids = []
+    failed = []
+
     for d in pending:
         doc_id = str(d["document_id"])
         url = d["url"]
@@ -205,7 +147,7 @@ def run(limit_docs: int = 10, sleep_s: float = 0.1):
             chunks = chunk_text(cleaned)
             if not chunks:
                 print(f"[embed_ollama] ⚠️ sin chunks doc_id={doc_id}")
-                mark_embedded(doc_id)
+                embedded_ids.append(doc_id)
                 continue
 
             # IDs deterministas
@@ -221,14 +163,43 @@ def run(limit_docs: int = 10, sleep_s: float = 0.1):
 
             col.upsert(ids=ids, documents=chunks, embeddings=embs, metadatas=metadatas)
 
-            mark_embedded(doc_id)
+            embedded_ids.append(doc_id)
             print(f"[embed_ollama] ✅ embedded doc_id={doc_id} chunks={len(chunks)} url={url}")
 
         except Exception as e:
+            failed.append((doc_id, e))
             print(f"[embed_ollama] ❌ error doc_id={doc_id} url={url} err={e}")
 
         time.sleep(sleep_s)
 
+    marked = mark_embedded_many(embedded_ids)
+    print(f"[embed_ollama] 💾 Marcados {marked}/{len(pending)} docs como embebidos")
+    if failed:
+        mark_embed_failed_many(failed)
+        print(f"[embed_ollama] ⏳ {len(failed)} docs con error reprogramados (backoff)")
+    return len(pending)
+
+
+def run(limit_docs: int = 10, sleep_s: float = 0.1):
+    col = get_chroma_collection()
+    process_batch(col, limit_docs=limit_docs, sleep_s=sleep_s)
+
+
+def run_forever(limit_docs: int = 10, sleep_s: float = 0.1, idle_timeout_s: float = 300):
+    """
+    Procesa mientras haya pendientes; con la cola vacía bloquea en
+    LISTEN web_normalized en vez de volver a consultar.
+    """
+    col = get_chroma_collection()
+    with Listener(CHANNEL_WEB_NORMALIZED) as listener:
+        while True:
+            if not process_batch(col, limit_docs=limit_docs, sleep_s=sleep_s):
+                print(f"[embed_ollama] 💤 Esperando NOTIFY {CHANNEL_WEB_NORMALIZED}...")
+                listener.wait(timeout_s=idle_timeout_s)
+
 
 if __name__ == "__main__":
-    run(limit_docs=10, sleep_s=0.1)
\ No newline at end of file
+    if "--listen" in sys.argv[1:]:
+        run_forever(limit_docs=10, sleep_s=0.1)
+    else:
+        run(limit_docs=10, sleep_s=0.1)
@@ -1,13 +1,15 @@
 import os
+import sys
 import time
 import re
-from typing import List, Dict, Any
+from typing import List
 
-import psycopg2
 from sentence_transformers import SentenceTransformer
 
 import chromadb
 from core.config import settings
+from core.database import fetch_pending_web_metadata_for_embedding, mark_embed_failed_many, mark_embedded_many
+from core.notify import CHANNEL_WEB_NORMALIZED, Listener
 
 
 # -------------------------
@@ -77,73 +79,6 @@ def get_chroma_collection():
     return client.get_or_create_collection("documents")
 
 
-# -------------------------
-# Supabase connection
-# -------------------------
-def get_connection():
-    return psycopg2.connect(
-        host=settings.SUPABASE_HOST,
-        database=settings.SUPABASE_DB,
-        user=settings.SUPABASE_USER,
-        password=settings.SUPABASE_PASSWORD,
-        port=int(settings.SUPABASE_PORT or 5432),
-        sslmode="require",
-    )
-
-
-# -------------------------
-# Fetch pending web_metadata (not embedded)
-# -------------------------
-def fetch_pending_web_metadata_for_embedding(limit: int = 10) -> List[Dict[str, Any]]:
-    """
-    Trae filas de web_metadata cuyo JSONB data tiene cleaned_text,
-    y que aún no se han embebido (embedded_at IS NULL).
-    """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT
-          wm.document_id,
-          wm.url,
-          COALESCE(d.title, '') as title,
-          COALESCE(wm.data->>'cleaned_text', '') as cleaned_text
-        FROM web_metadata wm
-        LEFT JOIN documents d ON d.id = wm.document_id
-        WHERE COALESCE(wm.data->>'cleaned_text', '') <> ''
-          AND wm.embedded_at IS NULL
-        ORDER BY wm.created_at DESC
-        LIMIT %s
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    return [
-        {"document_id": r[0], "url": r[1], "title": r[2], "cleaned_text": r[3]}
-        for r in rows
-    ]
-
-
-def mark_embedded(document_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        UPDATE web_metadata
-        SET embedded_at = NOW()
-        WHERE document_id = %s
-        """,
-        (document_id,),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-
-
 # -------------------------
 # Chunking
 # -------------------------
@@ -176,7 +111,13 @@ def chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str
 # -------------------------
 # Main worker
 # -------------------------
-def run(limit_docs: int = 5, sleep_s: float = 0.1):
+def load_model():
+    # Modelo liviano y muy usado (rápido en CPU)
+    model_name = os.getenv("ST_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    return model_name, SentenceTransformer(model_name)
+
+
+def process_batch(model_name: str, model, col, limit_docs: int = 5, sleep_s: float = 0.1) -> int:
     """
     1) Trae docs pendientes de web_metadata
     2) Parte en chunks
@@ -184,19 +125,17 @@ def run(limit_docs: int = 5, sleep_s: float = 0.1):
     4) Upsert a Chroma
     5) Marca embedded_at
     """
-    # Modelo liviano y muy usado (rápido en CPU)
-    model_name = os.getenv("ST_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-    model = SentenceTransformer(model_name)
-
-    col = get_chroma_collection()
-
     pending = fetch_pending_web_metadata_for_embedding(limit=limit_docs)
     if not pending:
         print("[embed_st] No hay pendientes (embedded_at IS NULL).")
-        return
+        return 0
 
     print(f"[embed_st] Procesando {len(pending)} documentos... model={model_name}")
 
+    # Se marcan todos juntos al final (un UPDATE/commit por batch)
+    embedded_ids = []
+    failed = []
+
     for d in pending:
         doc_id = str(d["document_id"])
         url = d["url"]
@@ -208,7 +147,7 @@ def run(limit_docs: int = 5, sleep_s: float = 0.1):
             chunks = chunk_text(cleaned, max_chars=1200, overlap=150)
             if not chunks:
                 print(f"[embed_st] ⚠️ sin chunks doc_id={doc_id}")
-                mark_embedded(doc_id)
+                embedded_ids.append(doc_id)
                 continue
 
             # IDs deterministas => rerun idempotente
@@ -240,14 +179,45 @@ def run(limit_docs: int = 5, sleep_s: float = 0.1):
                 metadatas=metadatas,
             )
 
-            mark_embedded(doc_id)
+            embedded_ids.append(doc_id)
             print(f"[embed_st] ✅ embedded doc_id={doc_id} chunks={len(chunks)} url={url}")
 
         except Exception as e:
+            failed.append((doc_id, e))
             print(f"[embed_st] ❌ error doc_id={doc_id} url={url} err={e}")
 
         time.sleep(sleep_s)
 
+    marked = mark_embedded_many(embedded_ids)
+    print(f"[embed_st] 💾 Marcados {marked}/{len(pending)} docs como embebidos")
+    if failed:
+        mark_embed_failed_many(failed)
+        print(f"[embed_st] ⏳ {len(failed)} docs con error reprogramados (backoff)")
+    return len(pending)
+
+
+def run(limit_docs: int = 5, sleep_s: float = 0.1):
+    model_name, model = load_model()
+    col = get_chroma_collection()
+    process_batch(model_name, model, col, limit_docs=limit_docs, sleep_s=sleep_s)
+
+
+def run_forever(limit_docs: int = 5, sleep_s: float = 0.1, idle_timeout_s: float = 300):
+    """
+    Procesa mientras haya pendientes; con la cola vacía bloquea en
+    LISTEN web_normalized. El modelo se carga una sola vez.
+    """
+    model_name, model = load_model()
+    col = get_chroma_collection()
+    with Listener(CHANNEL_WEB_NORMALIZED) as listener:
+        while True:
+            if not process_batch(model_name, model, col, limit_docs=limit_docs, sleep_s=sleep_s):
+                print(f"[embed_st] 💤 Esperando NOTIFY {CHANNEL_WEB_NORMALIZED}...")
+                listener.wait(timeout_s=idle_timeout_s)
+
 
 if __name__ == "__main__":
-    run(limit_docs=5, sleep_s=0.1)
\ No newline at end of file
+    if "--listen" in sys.argv[1:]:
+        run_forever(limit_docs=5, sleep_s=0.1)
+    else:
+        run(limit_docs=5, sleep_s=0.1)
@@ -1,8 +1,15 @@
 import re
+import sys
 import time
 from urllib.parse import urlparse
 
-from core.database import fetch_web_metadata_needing_refresh, upsert_web_metadata
+from core.database import (
+    fetch_pending_web_metadata,
+    fetch_web_metadata_needing_refresh,
+    mark_normalize_failed_many,
+    upsert_web_metadata_many,
+)
+from core.notify import CHANNEL_WEB_CRAWLED, Listener
 
 
 # -------------------------
@@ -186,51 +193,102 @@ def extract_people_from_markdown(cleaned_md: str) -> list[dict]:
 # -------------------------
 # Runner
 # -------------------------
+def claim_docs(limit: int) -> list[dict]:
+    """
+    Drena las dos colas de normalize:
+    1. docs recién crawleados sin fila en web_metadata (los que despierta web_crawled)
+    2. filas existentes con cleaned_text vacío o versión distinta de det_v1
+    """
+    docs = fetch_pending_web_metadata(limit=limit)
+    if len(docs) < limit:
+        docs += fetch_web_metadata_needing_refresh(limit=limit - len(docs))
+    return docs
+
+
+def process_round(round_i: int, limit: int = 50, sleep_s: float = 0.1) -> int:
+    docs = claim_docs(limit)
+    if not docs:
+        return 0
+
+    print(f"[normalize_det] Round {round_i}: procesando {len(docs)} docs...")
+
+    rows = []
+    failed = []
+    for d in docs:
+        doc_id = d["id"]
+        url = d["url"]
+        title = d["title"]
+        raw_text = d["raw_text"]
+
+        try:
+            cleaned = clean_markdown(raw_text)
+            if not cleaned:
+                # una fila sin cleaned_text seguiría cumpliendo el claim y se
+                # reclamaría otra vez de inmediato: va a backoff / dead-letter
+                raise ValueError("clean_markdown no dejó texto")
+            signals = extract_signals(cleaned)
+            people = extract_people_from_markdown(cleaned)
+
+            data = {
+                "version": "det_v1",
+                "url": url,
+                "title": title,
+                "entity_type": guess_entity_type(signals["headings"], url),
+                "signals": signals,
+                "structured": {"people": people},
+                "cleaned_text": cleaned,
+            }
+
+            rows.append({
+                "document_id": doc_id,
+                "url": url,
+                "content_type": "text/markdown",
+                "data": data,
+            })
+            print(f"[normalize_det] ✅ normalizado doc_id={doc_id} url={url}")
+
+        except Exception as e:
+            failed.append((doc_id, e))
+            print(f"[normalize_det] ❌ error doc_id={doc_id} url={url} err={e}")
+
+        time.sleep(sleep_s)
+
+    stats = upsert_web_metadata_many(rows)
+    print(
+        f"[normalize_det] 💾 Round {round_i}: {stats['inserted']} insertados, "
+        f"{stats['updated']} actualizados, {stats['unchanged']} sin cambios"
+    )
+    if failed:
+        mark_normalize_failed_many(failed)
+        print(f"[normalize_det] ⏳ Round {round_i}: {len(failed)} docs con error reprogramados (backoff)")
+    return len(docs)
+
+
 def run(limit: int = 50, sleep_s: float = 0.1, max_rounds: int = 50):
     for round_i in range(1, max_rounds + 1):
-        docs = fetch_web_metadata_needing_refresh(limit=limit)
-        if not docs:
+        if not process_round(round_i, limit=limit, sleep_s=sleep_s):
             print("[normalize_det] No hay pendientes.")
             return
 
-        print(f"[normalize_det] Round {round_i}: procesando {len(docs)} docs...")
-
-        for d in docs:
-            doc_id = d["id"]
-            url = d["url"]
-            title = d["title"]
-            raw_text = d["raw_text"]
-
-            try:
-                cleaned = clean_markdown(raw_text)
-                signals = extract_signals(cleaned)
-                people = extract_people_from_markdown(cleaned)
-
-                data = {
-                    "version": "det_v1",
-                    "url": url,
-                    "title": title,
-                    "entity_type": guess_entity_type(signals["headings"], url),
-                    "signals": signals,
-                    "structured": {"people": people},
-                    "cleaned_text": cleaned,
-                }
-
-                upsert_web_metadata(
-                    document_id=doc_id,
-                    url=url,
-                    content_type="text/markdown",
-                    data=data,
-                )
-                print(f"[normalize_det] ✅ upsert doc_id={doc_id} url={url}")
-
-            except Exception as e:
-                print(f"[normalize_det] ❌ error doc_id={doc_id} url={url} err={e}")
-
-            time.sleep(sleep_s)
-
     print(f"[normalize_det] ⚠️ Llegó a max_rounds={max_rounds}. Aún podrían quedar pendientes.")
 
 
+def run_forever(limit: int = 50, sleep_s: float = 0.1, idle_timeout_s: float = 300):
+    """
+    Procesa mientras haya pendientes; con la cola vacía bloquea en
+    LISTEN web_crawled en vez de volver a consultar.
+    """
+    round_i = 0
+    with Listener(CHANNEL_WEB_CRAWLED) as listener:
+        while True:
+            round_i += 1
+            if not process_round(round_i, limit=limit, sleep_s=sleep_s):
+                print(f"[normalize_det] 💤 Esperando NOTIFY {CHANNEL_WEB_CRAWLED}...")
+                listener.wait(timeout_s=idle_timeout_s)
+
+
 if __name__ == "__main__":
-    run(limit=50, sleep_s=0.1, max_rounds=50)
\ No newline at end of file
+    if "--listen" in sys.argv[1:]:
+        run_forever(limit=50, sleep_s=0.1)
+    else:
+        run(limit=50, sleep_s=0.1, max_rounds=50)
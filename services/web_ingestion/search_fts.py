@@ -1,32 +1,30 @@
-from core.database import get_connection
+from core.database import db_connection
 
 def search_fts(query: str, limit: int = 10):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT
-          d.id,
-          d.canonical_identifier as url,
-          wm.data->>'title' as title,
-          ts_rank_cd(
-            to_tsvector('spanish', wm.data->>'cleaned_text'),
-            plainto_tsquery('spanish', %s)
-          ) AS rank
-        FROM web_metadata wm
-        JOIN documents d ON d.id = wm.document_id
-        WHERE to_tsvector('spanish', wm.data->>'cleaned_text')
-              @@ plainto_tsquery('spanish', %s)
-        ORDER BY rank DESC
-        LIMIT %s
-        """,
-        (query, query, limit),
-    )
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    """
+    Búsqueda full-text sobre web_metadata.search_tsv (tsvector precalculado + GIN).
+    Requiere las migraciones 003 y 008 (ver core/migrations.py).
+    Solo lee columnas: no toca el JSONB data.
+    """
+
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+              d.id,
+              d.canonical_identifier as url,
+              d.title,
+              ts_rank_cd(wm.search_tsv, q) AS rank
+            FROM web_metadata wm
+            JOIN documents d ON d.id = wm.document_id
+            CROSS JOIN plainto_tsquery('spanish', %s) q
+            WHERE wm.search_tsv @@ q
+            ORDER BY rank DESC
+            LIMIT %s
+            """,
+            (query, limit),
+        )
+        rows = cur.fetchall()
 
     return rows
 
@@ -4,9 +4,9 @@ import re
 import time
 from dataclasses import dataclass
 from typing import List, Optional
-import requests
 
 from core.config import settings
+from core.http_cache import cached_get_json
 
 
 @dataclass(frozen=True)
@@ -48,9 +48,8 @@ def serpapi_search_urls(query: str, *, num_results: int = 10, page_limit: int =
             "start": page * 10,
         }
 
-        r = requests.get("https://serpapi.com/search.json", params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
+        # con HTTP_CACHE_ENABLED una consulta repetida no vuelve a cobrarse
+        data = cached_get_json("https://serpapi.com/search.json", params=params, timeout=30)
 
         organic = data.get("organic_results", []) or []
         for item in organic: